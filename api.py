@@ -1,9 +1,10 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
 import sqlite3
 from dotenv import load_dotenv
 import os
 import random
 from datetime import datetime
+import metrics
 
 load_dotenv()
 
@@ -74,6 +75,43 @@ async def get_random_tv_series():
         return {"series": series}
     cursor.close()
 
+@app.get("/metrics/zap")
+async def get_zap_metrics():
+    # Per-stage channel change latency histograms of the player running this API
+    return {name: summary for name, summary in metrics.snapshot().items() if name.startswith("zap.")}
+
+@app.get("/metrics")
+async def get_metrics():
+    # Every latency and drift histogram of the player running this API
+    return metrics.snapshot()
+
+# Channel control, only when the API runs inside the asyncio runtime (see runtime.py)
+def get_runtime():
+    runtime = getattr(app.state, "runtime", None)
+    if runtime is None:
+        raise HTTPException(status_code=503, detail="Channel control needs the playout runtime")
+    return runtime
+
+@app.get("/channel")
+async def get_channel():
+    runtime = get_runtime()
+    return {"channel": runtime.state.number, "channels": runtime.state.channel_numbers}
+
+@app.post("/channel/up")
+async def channel_up():
+    return {"channel": get_runtime().change_channel(step=1)}
+
+@app.post("/channel/down")
+async def channel_down():
+    return {"channel": get_runtime().change_channel(step=-1)}
+
+@app.post("/channel/{number}")
+async def set_channel(number: int):
+    runtime = get_runtime()
+    if number not in runtime.state.channel_numbers:
+        raise HTTPException(status_code=404, detail=f"No channel {number}")
+    return {"channel": runtime.change_channel(number)}
+
 # @app.get("/playingnow")
 # async def get_playing_now():
 #     now = datetime.now()
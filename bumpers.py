@@ -0,0 +1,148 @@
+import hashlib
+import logging
+import os
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from timeline import now_ms
+
+MB = 1024 * 1024
+
+# Render settings per template, the template name and version are part of every cache key
+TEMPLATES = {
+    "up_next": {
+        "version": 1,
+        "background": "backgroundvideo.mp4",
+        "duration": 5,
+        "font": "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
+        "fontsize": 48
+    }
+}
+
+# Global Vars
+service = None
+
+# Classes
+class BumperService:
+    # Renders "Up Next" bumpers on a bounded worker pool into a content-addressed cache directory.
+    # Requests return the final path straight away, the same bumper is only ever rendered once
+    # and least recently used files are removed once the cache outgrows its byte budget, except
+    # bumpers still waiting to air.
+    def __init__(self, cache_dir=None, workers=None, budget_mb=None):
+        self.cache_dir = cache_dir or os.getenv("BUMPER_CACHE_DIR", "./bumpers")
+        self.budget = int(float(budget_mb or os.getenv("BUMPER_CACHE_MB", 512)) * MB)
+        self.executor = ThreadPoolExecutor(max_workers=int(workers or os.getenv("BUMPER_WORKERS", 2)), thread_name_prefix="bumper")
+        self.inflight = {}
+        self.pinned = {}
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "rendered": 0, "failed": 0, "evicted": 0}
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def text_for(self, content):
+        if getattr(content, "show_name", None):
+            return f"Up Next: {content.show_name}"
+        return f"Up Next: {content.name}"
+
+    def key(self, content_id, text, template):
+        settings = TEMPLATES[template]
+        source = f"{template}:{settings['version']}:{content_id}:{text}"
+        return hashlib.sha1(source.encode("utf-8")).hexdigest()[:20]
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.mp4")
+
+    def request(self, content, template="up_next", airs_until=None):
+        # Path the bumper will be at, rendering it in the background unless it is cached or queued.
+        # Episodes of a show share one bumper, so the show name stands in for the content ID.
+        # airs_until (epoch ms) keeps the file out of eviction until its slot has aired.
+        text = self.text_for(content)
+        content_id = getattr(content, "show_name", None) or getattr(content, "filepath", None) or content.name
+        key = self.key(content_id, text, template)
+        path = self.path(key)
+
+        with self.lock:
+            if airs_until is not None:
+                self.pinned[path] = max(airs_until, self.pinned.get(path, 0))
+            if os.path.exists(path):
+                self.stats["hits"] += 1
+                os.utime(path)
+                return path
+            if key not in self.inflight:
+                self.inflight[key] = self.executor.submit(self.render, key, text, template)
+        return path
+
+    def wait(self, timeout=None):
+        # Block until everything queued so far is rendered, for tools and tests rather than the scheduler
+        with self.lock:
+            futures = list(self.inflight.values())
+        for future in futures:
+            future.result(timeout)
+
+    def render(self, key, text, template):
+        settings = TEMPLATES[template]
+        path = self.path(key)
+        partial = path + ".part.mp4"
+
+        with tempfile.NamedTemporaryFile(delete=False, suffix=".txt") as f:
+            f.write(text.encode("utf-8"))
+            textfile = f.name
+
+        cmd = [
+            "ffmpeg", "-y", "-loglevel", "error",
+            "-stream_loop", "-1", "-i", settings["background"],
+            "-t", str(settings["duration"]),
+            "-vf",
+            f"drawtext=fontfile={settings['font']}:"
+            f"textfile={textfile}:fontcolor=white:fontsize={settings['fontsize']}:"
+            f"x=(w-text_w)/2:y=h-100:shadowcolor=black:shadowx=2:shadowy=2",
+            "-c:v", "libx264", "-pix_fmt", "yuv420p", "-an", partial
+        ]
+
+        try:
+            subprocess.run(cmd, check=True)
+            os.replace(partial, path)
+            with self.lock:
+                self.stats["rendered"] += 1
+            logging.debug(f"Rendered bumper {path}: {text}")
+        except Exception as e:
+            with self.lock:
+                self.stats["failed"] += 1
+            logging.error(f"Could not render bumper {text}: {e}")
+            if os.path.exists(partial):
+                os.unlink(partial)
+        finally:
+            os.unlink(textfile)
+            with self.lock:
+                self.inflight.pop(key, None)
+        self.evict()
+        return path
+
+    def evict(self):
+        # Oldest use first, requests touch cached files so reused bumpers stay.
+        # Bumpers waiting to air count towards the budget but are never removed.
+        with self.lock:
+            now = now_ms()
+            self.pinned = {path: until for path, until in self.pinned.items() if until > now}
+            files = []
+            for name in os.listdir(self.cache_dir):
+                if name.endswith(".mp4") and ".part" not in name:
+                    stat = os.stat(os.path.join(self.cache_dir, name))
+                    files.append((stat.st_mtime, stat.st_size, name))
+            used = sum(size for _, size, _ in files)
+            for _, size, name in sorted(files):
+                if used <= self.budget:
+                    break
+                path = os.path.join(self.cache_dir, name)
+                if path in self.pinned:
+                    continue
+                os.unlink(path)
+                used -= size
+                self.stats["evicted"] += 1
+
+# Functions
+def get_service():
+    global service
+    if service is None:
+        service = BumperService()
+    return service
@@ -8,6 +8,7 @@ import json
 import ffmpeg
 from rich import print
 import time
+import subprocess
 
 # Load local env variables
 load_dotenv()
@@ -95,6 +96,15 @@ def initialize_tables():
         );
     """
     cursor.execute(query)
+
+    # Keyframe times of each program file in ms, comma separated, for tuning in mid-program
+    query = """
+        CREATE TABLE IF NOT EXISTS KEYFRAMES(
+            Filepath TEXT PRIMARY KEY,
+            Times TEXT
+        );
+    """
+    cursor.execute(query)
     
     # # Schedule
     # query = """
@@ -143,6 +153,57 @@ def get_runtime(file):
     duration = str(round(float(probe["format"]["duration"]), 2))
     return duration
 
+def get_keyframes(file):
+    """
+    Return keyframe times of the first video stream in milliseconds
+
+    Args:
+        file (str): Filename of video
+
+    Returns:
+        list: Keyframe times in ms, ascending
+    """
+
+    # Packet flags are enough to find keyframes, nothing gets decoded
+    output = subprocess.run(
+        ["ffprobe", "-v", "error", "-select_streams", "v:0", "-show_entries", "packet=pts_time,flags", "-of", "csv=p=0", file],
+        capture_output=True, text=True, check=True
+    ).stdout
+
+    times = []
+    for line in output.splitlines():
+        pts_time, _, flags = line.partition(",")
+        if "K" in flags and pts_time not in ("", "N/A"):
+            times.append(int(round(float(pts_time) * 1000)))
+    return sorted(times)
+
+def process_keyframes():
+    print("Processing keyframes")
+
+    # Episodes and movies are what the player tunes into mid-way
+    with sqlite3.connect(os.getenv("CATALOG_DB")) as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT Filepath FROM TV WHERE Filepath NOT IN (SELECT Filepath FROM KEYFRAMES)
+            UNION
+            SELECT Filepath FROM MOVIES WHERE Filepath NOT IN (SELECT Filepath FROM KEYFRAMES)
+        """)
+        files = [row[0] for row in cursor.fetchall()]
+
+        for file in files:
+            try:
+                times = get_keyframes(file)
+            except Exception as e:
+                print(f"Could not index keyframes of {file}: {e}")
+                continue
+            print(f"Indexed {len(times)} keyframes: {file}")
+            cursor.execute(
+                "INSERT OR REPLACE INTO KEYFRAMES (Filepath, Times) VALUES (?, ?)",
+                (file, ",".join(str(t) for t in times))
+            )
+            conn.commit()
+    conn.close()
+
 def update_movie_tags():
     with sqlite3.connect(os.getenv("CATALOG_DB")) as conn:
         cursor = conn.cursor()
@@ -457,4 +518,7 @@ process_mtv_idents()
 # Process all Movies
 process_movies()
 
+# Index keyframes of all TV and Movies
+process_keyframes()
+
 # update_movie_tags()
\ No newline at end of file
@@ -0,0 +1,96 @@
+import numpy as np
+from selection import RuntimeSelector
+
+# Classes
+class EpisodeIndex:
+    # Every show's episodes as one contiguous run of catalog rows sorted by season and episode
+    def __init__(self, catalog):
+        self.catalog = catalog
+
+        rows = catalog.indices(catalog.mask_type("tv") & (catalog.show_ref >= 0))
+        order = np.lexsort((catalog.episode[rows], catalog.season[rows], catalog.show_ref[rows]))
+        self.rows = rows[order]
+        self.keys = catalog.season[self.rows].astype(np.int32) * 10000 + catalog.episode[self.rows]
+
+        show_refs, starts, counts = np.unique(catalog.show_ref[self.rows], return_index=True, return_counts=True)
+        self.shows = {
+            catalog.strings.get(int(ref)): (int(start), int(count))
+            for ref, start, count in zip(show_refs, starts, counts)
+        }
+
+    def __len__(self):
+        return len(self.shows)
+
+    def show_names(self):
+        return list(self.shows)
+
+    def count(self, show_name):
+        return self.shows[show_name][1] if show_name in self.shows else 0
+
+    def episode_at(self, show_name, position):
+        start, count = self.shows[show_name]
+        return int(self.rows[start + position % count])
+
+    def episodes(self, show_name, position=0, amount=None):
+        start, count = self.shows[show_name]
+        end = count if amount is None else min(count, position + amount)
+        return self.rows[start + position:start + end]
+
+    def position_of(self, show_name, season_number, episode_number):
+        # First episode at or after the given season and episode, wraps to the start of the show.
+        # Unnumbered episodes are -1 in the catalog, progress saved as NULL sorts the same way
+        start, count = self.shows[show_name]
+        season_number = -1 if season_number is None else int(season_number)
+        episode_number = -1 if episode_number is None else int(episode_number)
+        key = season_number * 10000 + episode_number
+        position = int(np.searchsorted(self.keys[start:start + count], key, side="left"))
+        return position % count
+
+class TagIndex:
+    # Inverted index from tag to the rows carrying it, built once per catalog generation
+    def __init__(self, catalog, types=("movie",)):
+        self.catalog = catalog
+        self.selectors = {}
+
+        # Tag entries that belong to rows of the indexed types
+        entries = np.flatnonzero(catalog.mask_type(*types)[catalog.tag_rows])
+        entry_rows = catalog.tag_rows[entries]
+        entry_tags = catalog.tag_ids[entries]
+
+        order = np.lexsort((entry_rows, entry_tags))
+        self.rows = entry_rows[order]
+        tag_ids, starts, counts = np.unique(entry_tags[order], return_index=True, return_counts=True)
+        self.tags = {
+            catalog.tag_names[int(tag_id)]: (int(start), int(count))
+            for tag_id, start, count in zip(tag_ids, starts, counts)
+        }
+
+    def tag_names(self, min_count=1):
+        return [tag for tag, (_, count) in self.tags.items() if count >= min_count]
+
+    def count(self, tag):
+        return self.tags[tag][1] if tag in self.tags else 0
+
+    def rows_for(self, tag):
+        # Rows carrying the tag, sorted by row number
+        if tag not in self.tags:
+            return self.rows[:0]
+        start, count = self.tags[tag]
+        return self.rows[start:start + count]
+
+    def selector(self, *tags):
+        # Runtime-sorted selector over rows carrying all of the given tags, cached per tag set
+        key = frozenset(tags)
+        if key not in self.selectors:
+            tags = sorted(key, key=self.count)
+            rows = self.rows_for(tags[0])
+            for tag in tags[1:]:
+                rows = np.intersect1d(rows, self.rows_for(tag))
+            self.selectors[key] = RuntimeSelector(self.catalog, rows=rows)
+        return self.selectors[key]
+
+    def random_row(self, *tags, max_runtime_ms=None, exclude=None, rng=None):
+        selector = self.selector(*tags)
+        if max_runtime_ms is None:
+            return selector.pick(exclude, rng=rng)
+        return selector.pick_under(max_runtime_ms, exclude, rng=rng)
@@ -0,0 +1,236 @@
+import numpy as np
+
+# Content type codes stored in the type column
+TYPE_CODES = {
+    "tv": 0,
+    "movie": 1,
+    "commercial": 2,
+    "musicvideo": 3,
+    "ident": 4
+}
+TYPE_NAMES = {code: name for name, code in TYPE_CODES.items()}
+
+# Classes
+class StringTable:
+    # Every string lives in one UTF-8 blob, a ref is an index into the offsets array
+    def __init__(self):
+        self.blob = bytearray()
+        self.offsets = [0]
+        self.interned = {}
+
+    def add(self, text, intern=False):
+        if text is None:
+            return -1
+        if intern and text in self.interned:
+            return self.interned[text]
+
+        self.blob += str(text).encode("utf-8")
+        self.offsets.append(len(self.blob))
+        ref = len(self.offsets) - 2
+        if intern:
+            self.interned[text] = ref
+        return ref
+
+    def freeze(self):
+        self.blob = bytes(self.blob)
+        self.offsets = np.array(self.offsets, dtype=np.int64)
+        self.interned = {}
+
+    def get(self, ref):
+        if ref < 0:
+            return None
+        return self.blob[int(self.offsets[ref]):int(self.offsets[ref + 1])].decode("utf-8")
+
+    def nbytes(self):
+        return len(self.blob) + np.asarray(self.offsets).nbytes
+
+class ContentView:
+    # Lightweight stand-in for scheduler_v4.Content backed by a CompactCatalog row
+    __slots__ = ("catalog", "index", "start", "end")
+
+    def __init__(self, catalog, index):
+        self.catalog = catalog
+        self.index = int(index)
+        self.start = None
+        self.end = None
+
+    @property
+    def type(self):
+        return TYPE_NAMES[int(self.catalog.type_code[self.index])]
+
+    @property
+    def content_id(self):
+        return int(self.catalog.content_id[self.index])
+
+    @property
+    def name(self):
+        return self.catalog.strings.get(int(self.catalog.name_ref[self.index]))
+
+    @property
+    def filepath(self):
+        return self.catalog.strings.get(int(self.catalog.path_ref[self.index]))
+
+    @property
+    def overview(self):
+        return self.catalog.strings.get(int(self.catalog.overview_ref[self.index]))
+
+    @property
+    def tvdb_id(self):
+        return self.catalog.strings.get(int(self.catalog.tvdb_ref[self.index]))
+
+    @property
+    def show_name(self):
+        return self.catalog.strings.get(int(self.catalog.show_ref[self.index]))
+
+    @property
+    def season_number(self):
+        season = int(self.catalog.season[self.index])
+        return str(season) if season >= 0 else None
+
+    @property
+    def episode_number(self):
+        episode = int(self.catalog.episode[self.index])
+        return str(episode) if episode >= 0 else None
+
+    @property
+    def runtime_ms(self):
+        return int(self.catalog.runtime_ms[self.index])
+
+    @property
+    def runtime(self):
+        # Same format the catalog stores runtimes in, e.g. "1219.0" or "25.21"
+        return str(round(self.runtime_ms / 1000, 2))
+
+    @property
+    def tags(self):
+        return ",".join(self.catalog.tags_of(self.index))
+
+    def __repr__(self):
+        return f"ContentView({self.index}, {self.type}, {self.filepath})"
+
+class CatalogBuilder:
+    def __init__(self):
+        self.strings = StringTable()
+        self.tag_lookup = {}
+        self.tag_names = []
+        self.columns = {
+            "type_code": [],
+            "content_id": [],
+            "runtime_ms": [],
+            "season": [],
+            "episode": [],
+            "name_ref": [],
+            "path_ref": [],
+            "overview_ref": [],
+            "tvdb_ref": [],
+            "show_ref": []
+        }
+        self.tag_offsets = [0]
+        self.tag_ids = []
+
+    def intern_tag(self, tag):
+        if tag not in self.tag_lookup:
+            self.tag_lookup[tag] = len(self.tag_names)
+            self.tag_names.append(tag)
+        return self.tag_lookup[tag]
+
+    def add(self, name, type, overview, tvdb_id, tags, runtime, filepath, show_name=None, season_number=None, episode_number=None, content_id=None):
+        self.columns["type_code"].append(TYPE_CODES[type])
+        self.columns["content_id"].append(content_id if content_id is not None else -1)
+        self.columns["runtime_ms"].append(int(round(float(runtime) * 1000)))
+        self.columns["season"].append(int(season_number) if season_number is not None else -1)
+        self.columns["episode"].append(int(episode_number) if episode_number is not None else -1)
+
+        # Names and paths are unique per item, show names and TVDB IDs repeat a lot
+        name_ref = self.strings.add(name)
+        self.columns["name_ref"].append(name_ref)
+        self.columns["path_ref"].append(name_ref if filepath == name else self.strings.add(filepath))
+        self.columns["overview_ref"].append(self.strings.add(overview))
+        self.columns["tvdb_ref"].append(self.strings.add(tvdb_id, intern=True))
+        self.columns["show_ref"].append(self.strings.add(show_name, intern=True))
+
+        # catalog.py writes "movie," for movies without TVDB genres, skip the empty fragment
+        for tag in (tags or "").split(","):
+            if tag:
+                self.tag_ids.append(self.intern_tag(tag))
+        self.tag_offsets.append(len(self.tag_ids))
+
+    def build(self):
+        self.strings.freeze()
+        return CompactCatalog(
+            self.strings,
+            self.tag_names,
+            np.array(self.tag_offsets, dtype=np.int32),
+            np.array(self.tag_ids, dtype=np.int32),
+            type_code=np.array(self.columns["type_code"], dtype=np.int8),
+            content_id=np.array(self.columns["content_id"], dtype=np.int32),
+            runtime_ms=np.array(self.columns["runtime_ms"], dtype=np.int32),
+            season=np.array(self.columns["season"], dtype=np.int16),
+            episode=np.array(self.columns["episode"], dtype=np.int16),
+            name_ref=np.array(self.columns["name_ref"], dtype=np.int32),
+            path_ref=np.array(self.columns["path_ref"], dtype=np.int32),
+            overview_ref=np.array(self.columns["overview_ref"], dtype=np.int32),
+            tvdb_ref=np.array(self.columns["tvdb_ref"], dtype=np.int32),
+            show_ref=np.array(self.columns["show_ref"], dtype=np.int32)
+        )
+
+class CompactCatalog:
+    def __init__(self, strings, tag_names, tag_offsets, tag_ids, type_code, content_id, runtime_ms, season, episode, name_ref, path_ref, overview_ref, tvdb_ref, show_ref):
+        self.strings = strings
+        self.tag_names = tag_names
+        self.tag_lookup = {tag: i for i, tag in enumerate(tag_names)}
+        self.tag_offsets = tag_offsets
+        self.tag_ids = tag_ids
+        self.type_code = type_code
+        self.content_id = content_id
+        self.runtime_ms = runtime_ms
+        self.season = season
+        self.episode = episode
+        self.name_ref = name_ref
+        self.path_ref = path_ref
+        self.overview_ref = overview_ref
+        self.tvdb_ref = tvdb_ref
+        self.show_ref = show_ref
+
+        # Owning row of every entry in tag_ids, used to scatter tag matches back into masks
+        self.tag_rows = np.repeat(np.arange(len(type_code), dtype=np.int32), np.diff(tag_offsets))
+
+    def __len__(self):
+        return len(self.type_code)
+
+    def view(self, index):
+        return ContentView(self, index)
+
+    def views(self, mask=None):
+        indices = range(len(self)) if mask is None else np.flatnonzero(mask)
+        return [ContentView(self, i) for i in indices]
+
+    def tags_of(self, index):
+        start, end = self.tag_offsets[index], self.tag_offsets[index + 1]
+        return [self.tag_names[t] for t in self.tag_ids[start:end]]
+
+    # Filters, all return NumPy boolean masks over the catalog rows
+    def mask_type(self, *types):
+        return np.isin(self.type_code, [TYPE_CODES[t] for t in types])
+
+    def mask_runtime_under(self, seconds):
+        return self.runtime_ms <= int(seconds * 1000)
+
+    def mask_tag(self, *tags):
+        # Rows carrying any of the given tags
+        mask = np.zeros(len(self), dtype=bool)
+        tag_ids = [self.tag_lookup[t] for t in tags if t in self.tag_lookup]
+        if tag_ids:
+            mask[self.tag_rows[np.isin(self.tag_ids, tag_ids)]] = True
+        return mask
+
+    def indices(self, mask):
+        return np.flatnonzero(mask)
+
+    def nbytes(self):
+        columns = [
+            self.type_code, self.content_id, self.runtime_ms, self.season, self.episode,
+            self.name_ref, self.path_ref, self.overview_ref, self.tvdb_ref, self.show_ref,
+            self.tag_offsets, self.tag_ids, self.tag_rows
+        ]
+        return sum(c.nbytes for c in columns) + self.strings.nbytes()
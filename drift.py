@@ -0,0 +1,78 @@
+import logging
+import metrics
+import os
+from player import SystemClock
+from timeline import SECOND
+
+# Classes
+class DriftSync:
+    # Compares where mpv is with where the schedule says the channel should be. Small drift is
+    # eased out with a slight playback speed change, large drift is seeked away near an item
+    # boundary where a jump isn't noticed, the main loop retunes when mpv is on the wrong item.
+    def __init__(self, player, playlist_window, get_schedule, get_channel, interval=None, tolerance=None, seek_threshold=None, max_speed_adjust=None, boundary=None, clock=None):
+        self.player = player
+        self.playlist_window = playlist_window
+        self.get_schedule = get_schedule
+        self.get_channel = get_channel
+        self.clock = clock or SystemClock()
+        self.interval = float(interval or os.getenv("DRIFT_INTERVAL", 5))
+        self.tolerance = int(float(tolerance or os.getenv("DRIFT_TOLERANCE", 0.25)) * SECOND)
+        self.seek_threshold = int(float(seek_threshold or os.getenv("DRIFT_SEEK_THRESHOLD", 5)) * SECOND)
+        self.max_speed_adjust = float(max_speed_adjust or os.getenv("DRIFT_MAX_SPEED_ADJUST", 0.02))
+        self.boundary = int(float(boundary or os.getenv("DRIFT_BOUNDARY_SECONDS", 15)) * SECOND)
+        self.speed = 1.0
+        self.stats = {"checks": 0, "in_sync": 0, "nudged": 0, "seeks": 0, "deferred": 0, "off_item": 0, "last_drift_ms": None}
+
+    def tick(self):
+        # Periodic pass, check() returns the measured drift rather than a wait
+        try:
+            self.check()
+        except Exception as e:
+            logging.debug(f"Drift check skipped: {e}")
+
+    def retuned(self):
+        # A fresh tune-in starts on schedule, drop any speed correction left from the last channel
+        self.set_speed(1.0)
+
+    def set_speed(self, speed):
+        if speed != self.speed:
+            self.player.speed = speed
+            self.speed = speed
+
+    def check(self, now=None):
+        now = self.clock.now_ms() if now is None else now
+        scheduled = self.get_schedule(self.get_channel()).item_at(now)
+        playing = self.playlist_window.current()
+        position = self.player.time_pos
+        if scheduled is None or playing is None or position is None:
+            return None
+
+        self.stats["checks"] += 1
+        if playing["start"] != scheduled["start"]:
+            # mpv is still on another item, the playout loop sorts that out at the item's deadline
+            self.stats["off_item"] += 1
+            return None
+
+        expected = now - scheduled["start"]
+        drift = int(position * SECOND) - expected
+        self.stats["last_drift_ms"] = drift
+        metrics.record("drift.abs_ms", abs(drift))
+
+        if abs(drift) <= self.tolerance:
+            self.stats["in_sync"] += 1
+            self.set_speed(1.0)
+        elif abs(drift) < self.seek_threshold:
+            # Ahead plays slower and behind plays faster, catching up over roughly a minute
+            adjust = max(-self.max_speed_adjust, min(self.max_speed_adjust, drift / (60 * SECOND)))
+            self.stats["nudged"] += 1
+            self.set_speed(round(1.0 - adjust, 4))
+        elif expected <= self.boundary:
+            logging.info(f"Drift of {drift / SECOND:.1f}s at the start of {scheduled['name']}, seeking to {expected / SECOND:.1f}s")
+            self.stats["seeks"] += 1
+            self.set_speed(1.0)
+            self.player.seek(expected / SECOND, "absolute")
+        else:
+            # Too far off to nudge but mid-item, catch up as fast as allowed until the next boundary
+            self.stats["deferred"] += 1
+            self.set_speed(1.0 - self.max_speed_adjust if drift > 0 else 1.0 + self.max_speed_adjust)
+        return drift
@@ -0,0 +1,65 @@
+import os
+from keyframes import snap_to_keyframe
+from timeline import SECOND, ChannelTimeline
+
+# Functions
+def edl_escape(path):
+    # mpv EDL length-prefixed filename, safe for commas, semicolons and anything else in the path
+    return f"%{len(path.encode('utf-8'))}%{path}"
+
+def edl_url(parts, resolve=None):
+    # One virtual file playing every part back to back, each cut to its scheduled length
+    resolve = resolve or (lambda path: path)
+    entries = [
+        f"{edl_escape(resolve(part['filepath']))},start=0,length={(part['end'] - part['start']) / SECOND:.3f}"
+        for part in parts
+    ]
+    return "edl://" + ";".join(entries)
+
+def is_filler(item):
+    return item["tags"] == "commercial"
+
+def compile_slots(items):
+    # Group each program with the commercials after it into one slot item
+    slots = []
+    for item in items:
+        if slots and is_filler(item) and slots[-1]["end"] == item["start"]:
+            slot = slots[-1]
+            slot["parts"].append(item)
+            slot["end"] = item["end"]
+        else:
+            slot = dict(item, parts=[item])
+            slots.append(slot)
+
+    for slot in slots:
+        slot["runtime"] = str(round((slot["end"] - slot["start"]) / SECOND, 2))
+        slot["filepath"] = edl_url(slot["parts"])
+    return slots
+
+def snap_slot_offset(slot, offset):
+    # Keyframe snapping happens inside whichever part the offset lands in
+    if "parts" not in slot:
+        return snap_to_keyframe(slot["filepath"], offset)
+    for part in slot["parts"]:
+        part_offset = part["start"] - slot["start"]
+        if offset < part["end"] - slot["start"]:
+            return part_offset + snap_to_keyframe(part["filepath"], max(0, offset - part_offset))
+    return offset
+
+# Classes
+class SlotTimelines:
+    # Slot timelines per channel, recompiled only when the underlying items change. Keyed on what
+    # the timeline covers rather than the object, lazy schedules hand out a new timeline every call.
+    def __init__(self):
+        self.compiled = {}
+
+    def get(self, channel_number, timeline):
+        key = (len(timeline), timeline.starts[0], timeline.end()) if len(timeline) else None
+        source, slots = self.compiled.get(channel_number, (None, None))
+        if slots is None or source != key:
+            slots = ChannelTimeline(compile_slots(timeline.items))
+            self.compiled[channel_number] = (key, slots)
+        return slots
+
+    def enabled(self):
+        return os.getenv("PLAYOUT_EDL", "off") == "on"
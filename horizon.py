@@ -0,0 +1,74 @@
+import scheduler_v4
+import logging
+import os
+import threading
+from timeline import HOUR, HALF_HOUR, now_ms, format_ms, align_down
+
+# Classes
+class HorizonScheduler:
+    # Keeps every channel scheduled at least horizon_hours ahead and trims rows older than retention_hours.
+    # A channel is only extended once less than low_water_hours are left, then by whole blocks,
+    # so marathons and themed blocks are not chopped into the few minutes each tick has passed.
+    def __init__(self, channels, horizon_hours=None, retention_hours=None, interval=None, first_pass_hours=None, low_water_hours=None):
+        self.channels = channels
+        self.priority = None
+        self.horizon = int(float(horizon_hours or os.getenv("SCHEDULE_HORIZON_HOURS", 12)) * HOUR)
+        self.first_pass = min(self.horizon, int(float(first_pass_hours or os.getenv("SCHEDULE_FIRST_PASS_HOURS", 1)) * HOUR))
+        self.low_water = min(self.horizon, int(float(low_water_hours or os.getenv("SCHEDULE_LOW_WATER_HOURS", 6)) * HOUR))
+        self.retention = int(float(retention_hours or os.getenv("SCHEDULE_RETENTION_HOURS", 6)) * HOUR)
+        self.interval = float(interval or os.getenv("SCHEDULE_EXTEND_INTERVAL", 300))
+        self.stopped = threading.Event()
+
+    def stop(self):
+        # A pass in progress returns before its next channel
+        self.stopped.set()
+
+    def prioritize(self, channel_number):
+        # Channel the player is tuned to gets generated before the others
+        self.priority = str(channel_number)
+
+    def next_channel(self, pending):
+        for channel in pending:
+            if channel.number == self.priority:
+                return channel
+        return pending[0]
+
+    def bootstrap(self, channel_number, hours=None):
+        # Synchronously schedule just enough of one channel to start playing it
+        reach = int(float(hours or os.getenv("SCHEDULE_BOOTSTRAP_HOURS", 1)) * HOUR)
+        channel = [c for c in self.channels if c.number == str(channel_number)][0]
+        self.prioritize(channel_number)
+        return self.extend(channel, now_ms(), reach)
+
+    def tick(self):
+        # First give every channel a playable hour, tuned channel first, then fill out the full horizon
+        for reach, low_water in ((self.first_pass, self.first_pass), (self.horizon, self.low_water)):
+            pending = list(self.channels)
+            while pending:
+                if self.stopped.is_set():
+                    return
+                channel = self.next_channel(pending)
+                pending.remove(channel)
+                self.extend(channel, now_ms(), reach, low_water)
+
+        removed = scheduler_v4.trim_schedule(now_ms() - self.retention)
+        if removed:
+            logging.debug(f"Trimmed {removed} aired schedule rows")
+
+    def extend(self, channel, now, reach=None, low_water=None):
+        reach = self.horizon if reach is None else reach
+        low_water = reach if low_water is None else low_water
+        target = now + reach
+        end = scheduler_v4.get_schedule_end(channel.number)
+
+        # Nothing on record starts at the current half hour. A schedule that ran out resumes at the
+        # current half hour, or at its End when that is later, so new rows never overlap stored ones
+        if end is None:
+            end = align_down(now, HALF_HOUR)
+        elif end < now:
+            end = max(end, align_down(now, HALF_HOUR))
+
+        if end < now + low_water:
+            logging.debug(f"Channel {channel.number} scheduled until {format_ms(end)}, extending to {format_ms(target)}")
+            end = scheduler_v4.extend_schedule(channel, end, target)
+        return end
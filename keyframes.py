@@ -0,0 +1,28 @@
+import logging
+import os
+import sqlite3
+from bisect import bisect_right
+from functools import lru_cache
+
+# Functions
+@lru_cache(maxsize=256)
+def get_keyframes(filepath):
+    # Keyframe times in ms indexed by catalog.py, empty when the file was never indexed
+    try:
+        with sqlite3.connect(os.getenv("CATALOG_DB")) as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT Times FROM KEYFRAMES WHERE Filepath = ?", (filepath,))
+            row = cursor.fetchone()
+        conn.close()
+    except sqlite3.OperationalError as e:
+        logging.debug(f"No keyframe index available: {e}")
+        return ()
+    if not row or not row[0]:
+        return ()
+    return tuple(int(t) for t in row[0].split(","))
+
+def snap_to_keyframe(filepath, offset):
+    # Latest keyframe at or before offset ms, so decoding starts right where playback does
+    times = get_keyframes(filepath)
+    i = bisect_right(times, offset) - 1
+    return times[i] if i >= 0 else offset
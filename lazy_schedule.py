@@ -0,0 +1,97 @@
+import scheduler_v4
+import hashlib
+import logging
+import os
+import random
+import numpy as np
+from functools import lru_cache
+from timeline import HOUR, format_ms, align_down, day_start
+from scheduler_v4 import Channel, ContentPools, RuntimeSelector
+
+# Classes
+class LazySchedule:
+    # A channel's lineup as a pure function of (channel seed, catalog version, window start).
+    # Windows are built on demand and memoized, nothing is written to the schedule DB.
+    def __init__(self, channel, seed=None, window_hours=None, cache_size=None):
+        self.channel = channel
+        self.seed = channel.seed if seed is None else seed
+        self.window = int(float(window_hours or os.getenv("LAZY_WINDOW_HOURS", 6)) * HOUR)
+        self.window_items = lru_cache(maxsize=int(cache_size or os.getenv("LAZY_CACHE_WINDOWS", 16)))(self.generate_window)
+
+    def window_start(self, t):
+        return align_down(t, self.window)
+
+    def window_rng(self, window_start, scope="window"):
+        key = f"{self.seed}:{scheduler_v4.catalog.version}:{window_start}"
+        if scope != "window":
+            key = f"{key}:{scope}"
+        return random.Random(int(hashlib.sha256(key.encode("utf-8")).hexdigest(), 16))
+
+    def day_rng(self, day):
+        return self.window_rng(day, "day")
+
+    def tail_selector(self, strategy, show_name, t):
+        # Refill the end of a window with what the block airing there would have picked from
+        catalog = scheduler_v4.catalog
+        if strategy == "PPV":
+            movie = scheduler_v4.ppv_movie(catalog, self.day_rng(day_start(t)))
+            return RuntimeSelector(catalog, rows=np.array([] if movie is None else [movie], dtype=np.int64))
+        if strategy == "TVMarathon" and show_name:
+            return RuntimeSelector(catalog, rows=scheduler_v4.episode_index.episodes(show_name))
+        if strategy == "MoviesByTag":
+            return RuntimeSelector(catalog, catalog.mask_type("movie"))
+        if strategy == "MTV":
+            return RuntimeSelector(catalog, catalog.mask_type("musicvideo"))
+        return RuntimeSelector(catalog, catalog.mask_type("tv", "movie"))
+
+    def generate_window(self, window_start, catalog_version):
+        # catalog_version is only part of the cache key, a reloaded catalog gives new windows
+        rng = self.window_rng(window_start)
+        window_end = window_start + self.window
+
+        # Scratch channel so generation never touches the real channel or marathon progress
+        scratch = Channel(self.channel.name, self.channel.number, self.channel.description, self.channel.strategies, self.channel.config_hash, self.seed)
+        scheduler_v4.generate_schedule(scratch, window_start, window_end, rng=rng, resume=False, day_rng=self.day_rng)
+
+        # Blocks may run past the window, drop anything that would end after it and refill the tail
+        # from the same kind of content as the last block, a PPV channel keeps its movie
+        all_rows = scratch.pending
+        rows = [row for row in all_rows if row[10] <= window_end]
+        scratch.pending = []
+        marker = rows[-1][10] if rows else window_start
+        if marker < window_end:
+            # Marathons stay on the show the last block was airing
+            show_names = [row[2] for row in all_rows if row[2]]
+            pools = ContentPools(scheduler_v4.catalog, scheduler_v4.min_repeat_distance, rng)
+            selector = self.tail_selector(scratch.last_strategy, show_names[-1] if show_names else None, marker)
+            scheduler_v4.fill_gap(scratch, pools, selector, marker, window_end)
+            rows.extend(scratch.pending)
+
+        # Whatever is left is shorter than any commercial and stays a gap, every End is a real runtime
+        if rows and rows[-1][10] < window_end:
+            logging.debug(f"Channel {self.channel.number} window {format_ms(window_start)} ends with a {(window_end - rows[-1][10]) / 1000:.1f}s gap")
+
+        logging.debug(f"Generated {len(rows)} rows for channel {self.channel.number} window {format_ms(window_start)}")
+        return tuple(rows)
+
+    def rows_for(self, window_start):
+        scheduler_v4.load_catalog()
+        return self.window_items(window_start, scheduler_v4.catalog.version)
+
+    def items_between(self, t0, t1):
+        # Schedule rows overlapping [t0, t1) in airing order
+        rows = []
+        window_start = self.window_start(t0)
+        while window_start < t1:
+            rows.extend(row for row in self.rows_for(window_start) if row[10] > t0 and row[9] < t1)
+            window_start += self.window
+        return rows
+
+    def item_at(self, t):
+        for row in self.rows_for(self.window_start(t)):
+            if row[9] <= t < row[10]:
+                return row
+        return None
+
+    def cache_info(self):
+        return self.window_items.cache_info()
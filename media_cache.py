@@ -0,0 +1,188 @@
+import hashlib
+import logging
+import os
+import re
+import threading
+from timeline import HOUR, now_ms
+
+GB = 1024 * 1024 * 1024
+COPY_CHUNK = 16 * 1024 * 1024
+
+# Names cache_path() gives out, nothing else in the cache directory is ever touched
+CACHE_NAME = re.compile(r"^[0-9a-f]{20}(\.[^./]*)?(\.part)?$")
+
+# Classes
+class MediaCache:
+    # Copies media airing in the next few hours from the slow USB root into a fast local directory
+    # and hands the copy to the player when there is one. The most aired files are copied first and
+    # kept longest, eviction drops the least aired, least recently used copies past the byte budget.
+    # in_use() returns source paths the player holds, their copies are never evicted.
+    def __init__(self, get_schedule, channel_numbers, cache_dir=None, budget_gb=None, lookahead_hours=None, interval=None, in_use=None):
+        self.get_schedule = get_schedule
+        self.channel_numbers = [int(number) for number in channel_numbers]
+        self.cache_dir = cache_dir or os.getenv("MEDIA_CACHE_DIR")
+        self.budget = int(float(budget_gb or os.getenv("MEDIA_CACHE_GB", 8)) * GB)
+        self.lookahead = int(float(lookahead_hours or os.getenv("MEDIA_CACHE_LOOKAHEAD_HOURS", 3)) * HOUR)
+        self.interval = float(interval or os.getenv("MEDIA_CACHE_INTERVAL", 300))
+        self.in_use = in_use or (lambda: ())
+        self.entries = {}
+        self.airs = {}
+        self.seen = set()
+        self.passes = 0
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "bytes_saved": 0, "copied": 0, "copied_bytes": 0, "evicted": 0}
+        self.stopped = threading.Event()
+
+    def enabled(self):
+        return bool(self.cache_dir)
+
+    def cache_path(self, path):
+        # Content is addressed by its source path, the extension stays so mpv picks the right demuxer
+        digest = hashlib.sha1(path.encode("utf-8")).hexdigest()[:20]
+        return os.path.join(self.cache_dir, digest + os.path.splitext(path)[1])
+
+    def resolve(self, path):
+        # Path the player should open, the local copy when we have one
+        with self.lock:
+            entry = self.entries.get(path)
+            if entry is None:
+                self.stats["misses"] += 1
+                return path
+            entry["last_used"] = now_ms()
+            self.stats["hits"] += 1
+            self.stats["bytes_saved"] += entry["size"]
+            return entry["cached_path"]
+
+    def report(self):
+        with self.lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            cached_bytes = sum(entry["size"] for entry in self.entries.values())
+            return dict(self.stats, hit_rate=round(self.stats["hits"] / lookups, 3) if lookups else None, files=len(self.entries), cached_bytes=cached_bytes)
+
+    def stop(self):
+        # A copy in progress gives up at its next chunk
+        self.stopped.set()
+
+    def upcoming(self):
+        # Every file airing within the lookahead, counting each airing once across passes
+        now = now_ms()
+        paths = []
+        for channel_number in self.channel_numbers:
+            timeline = self.get_schedule(channel_number)
+            i = timeline.index_at(now)
+            if i is None:
+                i = timeline.next_index(now)
+            if i is None:
+                continue
+            for item in timeline.items[i:]:
+                if item["start"] > now + self.lookahead:
+                    break
+                key = (channel_number, item["start"])
+                if key not in self.seen:
+                    self.seen.add(key)
+                    self.airs[item["filepath"]] = self.airs.get(item["filepath"], 0) + 1
+                paths.append(item["filepath"])
+
+        # Forget airings that are long over
+        self.seen = {key for key in self.seen if key[1] > now - self.lookahead}
+        return list(dict.fromkeys(paths))
+
+    def score(self, path):
+        entry = self.entries.get(path)
+        return (self.airs.get(path, 0), entry["last_used"] if entry else 0)
+
+    def tick(self):
+        # Most aired first, so bumpers and commercials that repeat all day are copied before one-off programs.
+        # The first pass also clears out copies from earlier runs once this run has claimed what it needs.
+        upcoming = self.upcoming()
+        for path in sorted(upcoming, key=lambda path: -self.airs.get(path, 0)):
+            if self.stopped.is_set():
+                break
+            if path in self.entries:
+                continue
+            cached_path = self.cache_path(path)
+            try:
+                source = os.stat(path)
+            except OSError:
+                continue
+            size = source.st_size
+            if size > self.budget or not self.make_room(size, self.score(path)):
+                continue
+
+            # A copy left from an earlier run is reused when it is complete and the source has not changed since
+            if not self.is_current(cached_path, source):
+                if not self.copy(path, cached_path, source):
+                    break
+                self.stats["copied"] += 1
+                self.stats["copied_bytes"] += size
+            with self.lock:
+                self.entries[path] = {"cached_path": cached_path, "size": size, "last_used": now_ms()}
+
+        if self.passes == 0 and not self.stopped.is_set():
+            self.remove_orphans(upcoming)
+        self.passes += 1
+        logging.debug(f"Media cache: {self.report()}")
+
+    def remove_orphans(self, upcoming=()):
+        # Copies from earlier runs that nothing upcoming claimed would sit outside the budget forever.
+        # Copies of upcoming files are kept even if this pass did not get to claim them yet.
+        with self.lock:
+            keep = {os.path.basename(entry["cached_path"]) for entry in self.entries.values()}
+        keep.update(os.path.basename(self.cache_path(path)) for path in upcoming)
+        for name in os.listdir(self.cache_dir):
+            if name in keep or not CACHE_NAME.match(name):
+                continue
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except OSError:
+                pass
+
+    def is_current(self, cached_path, source):
+        try:
+            copy = os.stat(cached_path)
+        except OSError:
+            return False
+        return copy.st_size == source.st_size and copy.st_mtime_ns == source.st_mtime_ns
+
+    def copy(self, path, cached_path, source):
+        # Copy beside the target and rename, the player never sees a partial file.
+        # The copy takes the source's mtime so a later run can tell whether it is still current.
+        # Goes in chunks so stop() doesn't wait out a multi-GB file, returns False when it gave up.
+        partial = cached_path + ".part"
+        with open(path, "rb") as src, open(partial, "wb") as dst:
+            while not self.stopped.is_set():
+                chunk = src.read(COPY_CHUNK)
+                if not chunk:
+                    break
+                dst.write(chunk)
+        if self.stopped.is_set():
+            os.remove(partial)
+            return False
+        os.utime(partial, ns=(source.st_atime_ns, source.st_mtime_ns))
+        os.replace(partial, cached_path)
+        return True
+
+    def make_room(self, size, score):
+        # Evict lower scoring copies until size fits, gives up if only better copies are left
+        used = sum(entry["size"] for entry in self.entries.values())
+        victims = sorted(self.entries, key=self.score)
+        while used + size > self.budget:
+            if not victims or self.score(victims[0]) >= score:
+                return False
+            victim = victims.pop(0)
+            with self.lock:
+                entry = self.entries.pop(victim)
+
+            # Checked after the entry is gone, so the player either queued it before (pinned here)
+            # or resolves it to the source from now on
+            if victim in self.in_use():
+                with self.lock:
+                    self.entries[victim] = entry
+                continue
+            used -= entry["size"]
+            self.stats["evicted"] += 1
+            try:
+                os.remove(entry["cached_path"])
+            except OSError:
+                pass
+        return True
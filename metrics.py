@@ -0,0 +1,105 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+# Global Vars
+histograms = {}
+lock = threading.Lock()
+current_zap = None
+
+# Classes
+class Histogram:
+    # Latency samples in ms, keeps the most recent max_samples for percentiles
+    def __init__(self, max_samples=None):
+        self.samples = deque(maxlen=int(max_samples or os.getenv("METRICS_MAX_SAMPLES", 2048)))
+        self.count = 0
+        self.total = 0.0
+
+    def record(self, value):
+        self.samples.append(value)
+        self.count += 1
+        self.total += value
+
+    def percentile(self, p):
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+    def summary(self):
+        if not self.samples:
+            return {"count": 0}
+        return {
+            "count": self.count,
+            "mean": round(self.total / self.count, 2),
+            "p50": round(self.percentile(50), 2),
+            "p95": round(self.percentile(95), 2),
+            "p99": round(self.percentile(99), 2),
+            "max": round(max(self.samples), 2)
+        }
+
+class ZapTrace:
+    # Monotonic timestamps of one channel change, each stage is recorded as time since the previous one
+    def __init__(self, channel_number):
+        self.channel_number = channel_number
+        self.started = time.monotonic()
+        self.last = self.started
+        self.stages = []
+
+    def mark(self, stage):
+        now = time.monotonic()
+        self.stages.append((stage, (now - self.last) * 1000))
+        self.last = now
+
+    def total(self):
+        return (self.last - self.started) * 1000
+
+# Functions
+def record(name, value):
+    with lock:
+        if name not in histograms:
+            histograms[name] = Histogram()
+        histograms[name].record(value)
+
+def begin_zap(channel_number):
+    # Keypress, a zap still in flight is abandoned for the new one
+    global current_zap
+    with lock:
+        current_zap = ZapTrace(channel_number)
+
+def mark(stage):
+    with lock:
+        zap = current_zap
+    if zap is not None:
+        zap.mark(stage)
+
+def end_zap(stage="first_frame"):
+    global current_zap
+    with lock:
+        zap, current_zap = current_zap, None
+    if zap is None:
+        return None
+
+    zap.mark(stage)
+    for name, value in zap.stages:
+        record(f"zap.{name}", value)
+    record("zap.total", zap.total())
+    logging.debug(f"Zap to {zap.channel_number}: " + ", ".join(f"{name} {value:.1f} ms" for name, value in zap.stages) + f", total {zap.total():.1f} ms")
+    return zap
+
+def snapshot():
+    with lock:
+        return {name: histogram.summary() for name, histogram in sorted(histograms.items())}
+
+def dump():
+    # Log every histogram, and write them to METRICS_FILE when set
+    stats = snapshot()
+    for name, summary in stats.items():
+        logging.info(f"{name}: {summary}")
+    path = os.getenv("METRICS_FILE")
+    if path:
+        with open(path, "w") as file:
+            json.dump(stats, file, indent=4)
@@ -0,0 +1,191 @@
+import asyncio
+import os
+from timeline import SECOND, now_ms
+
+# Classes
+class SystemClock:
+    def now_ms(self):
+        return now_ms()
+
+    async def wait(self, event, deadline):
+        # Until the event is set or the deadline in epoch ms passes, a None deadline waits for the event
+        timeout = None if deadline is None else max(0, (deadline - self.now_ms()) / SECOND)
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+class VirtualClock:
+    # Simulated wall clock in epoch ms that only moves when told to. Tasks waiting on it stay parked
+    # until their event is set or advance_to() passes their deadline, whoever drives the clock
+    # checks idle() to know every task is parked and jumps to next_deadline().
+    def __init__(self, start):
+        self.now = start
+        self.sleepers = {}
+
+    def now_ms(self):
+        return self.now
+
+    def advance_to(self, t):
+        self.now = max(self.now, t)
+        for future, (deadline, event) in self.sleepers.items():
+            if deadline is not None and deadline <= self.now and not future.done():
+                future.set_result(None)
+
+    def next_deadline(self):
+        deadlines = [deadline for deadline, event in self.sleepers.values() if deadline is not None]
+        return min(deadlines) if deadlines else None
+
+    def idle(self, count):
+        # count tasks parked with nothing about to wake them
+        return len(self.sleepers) == count and not any(future.done() or event.is_set() for future, (deadline, event) in self.sleepers.items())
+
+    async def wait(self, event, deadline):
+        if event.is_set() or (deadline is not None and deadline <= self.now):
+            return
+        future = asyncio.get_running_loop().create_future()
+        self.sleepers[future] = (deadline, event)
+        waiter = asyncio.ensure_future(event.wait())
+        try:
+            await asyncio.wait((future, waiter), return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            waiter.cancel()
+            del self.sleepers[future]
+
+class FakeEvent:
+    def __init__(self, name):
+        self.name = name
+
+class FakePlayer:
+    # Stands in for mpv: keeps a playlist, reports time-pos from a clock, moves to the next entry
+    # when a file's duration runs out and fires the same events and property changes mpv does.
+    # duration_of(path) gives each file's length in seconds.
+    def __init__(self, clock, duration_of, load_delay=0):
+        self.clock = clock
+        self.duration_of = duration_of
+        self.load_delay = load_delay
+        self.playlist = []
+        self.playlist_pos = None
+        self.speed = 1.0
+        self.loaded_at = None
+        self.start_pos = 0.0
+        self.observers = {}
+        self.callbacks = {}
+        self.commands = 0
+
+    # mpv API subset
+    def observe_property(self, name, handler):
+        self.observers.setdefault(name, []).append(handler)
+
+    def event_callback(self, *event_types):
+        def register(callback):
+            for event_type in event_types:
+                self.callbacks.setdefault(event_type, []).append(callback)
+            return callback
+        return register
+
+    def command(self, name, *args):
+        self.commands += 1
+
+    def loadfile(self, filename, mode="replace", index=None, **options):
+        self.commands += 1
+        if mode == "replace":
+            self.playlist = [filename]
+            self.open(0, float(options.get("start", 0)))
+        else:
+            self.playlist.append(filename)
+
+    def playlist_append(self, filename, **options):
+        self.commands += 1
+        self.playlist.append(filename)
+
+    def playlist_remove(self, index="current"):
+        self.commands += 1
+        index = self.playlist_pos if index == "current" else index
+        self.playlist.pop(index)
+        if index < self.playlist_pos:
+            self.playlist_pos -= 1
+            self.notify("playlist-pos", self.playlist_pos)
+
+    def playlist_clear(self):
+        self.playlist = self.playlist[self.playlist_pos:self.playlist_pos + 1] if self.playlist_pos is not None else []
+        self.playlist_pos = 0 if self.playlist else None
+
+    def seek(self, amount, reference="relative"):
+        self.commands += 1
+        position = amount if reference == "absolute" else self.time_pos + amount
+        self.start_pos = max(0.0, position)
+        self.loaded_at = self.clock.now_ms()
+        self.fire("playback-restart")
+
+    def wait_for_property(self, name, *args, **kwargs):
+        return getattr(self, name.replace("-", "_"))
+
+    def terminate(self):
+        self.playlist = []
+        self.playlist_pos = None
+
+    @property
+    def path(self):
+        return None if self.playlist_pos is None else self.playlist[self.playlist_pos]
+
+    @property
+    def duration(self):
+        return None if self.path is None else self.duration_of(self.path)
+
+    @property
+    def time_pos(self):
+        if self.loaded_at is None or self.path is None:
+            return None
+        return self.start_pos + (self.clock.now_ms() - self.loaded_at) / SECOND * self.speed
+
+    @time_pos.setter
+    def time_pos(self, value):
+        self.seek(value, "absolute")
+
+    # Simulation
+    def open(self, position, start=0.0):
+        self.playlist_pos = position
+        self.start_pos = start
+        self.loaded_at = self.clock.now_ms() + self.load_delay
+        self.fire("file-loaded")
+        self.fire("playback-restart")
+        self.notify("playlist-pos", position)
+
+    def ends_at(self):
+        # Clock time the current file runs out
+        if self.path is None:
+            return None
+        remaining = (self.duration - self.start_pos) / self.speed
+        return self.loaded_at + int(remaining * SECOND)
+
+    def advance(self):
+        # Move past every file that has finished by now, like mpv's playlist would
+        while self.path is not None and self.clock.now_ms() >= self.ends_at():
+            finished = self.ends_at()
+            self.fire("end-file")
+            if self.playlist_pos + 1 >= len(self.playlist):
+                self.playlist_pos = None
+                return
+            self.playlist_pos += 1
+            self.start_pos = 0.0
+            self.loaded_at = finished
+            self.fire("file-loaded")
+            self.notify("playlist-pos", self.playlist_pos)
+
+    def fire(self, name):
+        for callback in self.callbacks.get(name, []):
+            callback(FakeEvent(name))
+
+    def notify(self, name, value):
+        for handler in self.observers.get(name, []):
+            handler(name, value)
+
+# Functions
+def create_player(backend=None, **options):
+    # "mpv" is the real output, "mpv-null" decodes without audio or video output for benchmarks
+    backend = backend or os.getenv("PLAYER_BACKEND", "mpv")
+    import mpv
+    if backend == "mpv-null":
+        return mpv.MPV(vo="null", ao="null", **options)
+    return mpv.MPV(sub="no", vo="gpu", hwdec="drm-copy", **options)
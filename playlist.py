@@ -0,0 +1,71 @@
+import logging
+import metrics
+from edl import edl_url
+import os
+import threading
+
+# Classes
+class PlaylistWindow:
+    # Keeps only the airing item and the next few in mpv's playlist. Played entries are removed and
+    # the window topped up as mpv moves on, a retune replaces the whole window with one loadfile.
+    def __init__(self, player, size=None, resolve=None):
+        self.player = player
+        self.resolve = resolve or (lambda path: path)
+        self.size = max(1, int(size or os.getenv("PLAYLIST_WINDOW", 3)))
+        self.lock = threading.RLock()
+        self.queued = []
+        self.next_item = None
+        player.observe_property("playlist-pos", self.on_playlist_pos)
+
+    def retune(self, item, next_item, **options):
+        # next_item(item) returns whatever airs after item, None when the schedule runs out
+        with self.lock:
+            self.next_item = next_item
+            self.queued = [item]
+            self.player.loadfile(self.path_of(item), "replace", **options)
+            metrics.mark("loadfile")
+            self.top_up()
+            metrics.mark("playlist")
+
+    def path_of(self, item):
+        # EDL slots are rebuilt from their parts so every part can come from the media cache
+        if "parts" in item:
+            return edl_url(item["parts"], self.resolve)
+        return self.resolve(item["filepath"])
+
+    def top_up(self):
+        while self.next_item and len(self.queued) < self.size:
+            item = self.next_item(self.queued[-1])
+            if item is None:
+                break
+            # Queued before resolving, see paths()
+            self.queued.append(item)
+            self.player.playlist_append(self.path_of(item))
+
+    def on_playlist_pos(self, name, value):
+        with self.lock:
+            # Events can trail a retune, trust mpv's current position over the reported value
+            position = self.player.playlist_pos
+            if position is None or position <= 0:
+                return
+            for _ in range(min(position, len(self.queued))):
+                self.player.playlist_remove(0)
+                self.queued.pop(0)
+            logging.debug(f"Playlist window advanced {position}, now {len(self.queued)} queued")
+            self.top_up()
+
+    def paths(self):
+        # Source paths of everything queued in mpv, items are queued before their paths are
+        # resolved so anything handed to the player is always listed here
+        with self.lock:
+            return {part["filepath"] for item in self.queued for part in item.get("parts", [item])}
+
+    def current(self):
+        with self.lock:
+            return self.queued[0] if self.queued else None
+
+    def clear(self):
+        with self.lock:
+            self.queued = []
+            self.next_item = None
+            self.player.playlist_clear()
@@ -0,0 +1,130 @@
+import logging
+import os
+import threading
+from collections import OrderedDict
+from timeline import SECOND, MINUTE, now_ms
+
+MB = 1024 * 1024
+
+# Functions
+def warm_range(path, offset, length):
+    # Ask the kernel to pull a byte range into the page cache, reading it when fadvise isn't available
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError as e:
+        logging.debug(f"Could not open {path} to warm: {e}")
+        return False
+    try:
+        if hasattr(os, "posix_fadvise"):
+            os.posix_fadvise(fd, offset, length, os.POSIX_FADV_WILLNEED)
+        else:
+            os.lseek(fd, offset, os.SEEK_SET)
+            remaining = length
+            while remaining > 0 and os.read(fd, min(remaining, MB)):
+                remaining -= MB
+    finally:
+        os.close(fd)
+    return True
+
+def drop_range(path, offset, length):
+    # Let the kernel reclaim a range we warmed earlier
+    if not hasattr(os, "posix_fadvise"):
+        return
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.posix_fadvise(fd, offset, length, os.POSIX_FADV_DONTNEED)
+    finally:
+        os.close(fd)
+
+# Classes
+class Prefetcher:
+    # Follows every channel's upcoming items and pulls the start of each file into the page cache
+    # before it airs, tuned channel first. Warmed ranges are kept within a byte budget, dropping what
+    # nothing upcoming needs first and never the tuned channel's current and next item.
+    def __init__(self, get_schedule, channel_numbers, lookahead_minutes=None, lookahead_items=None, head_mb=None, budget_mb=None, interval=None):
+        self.get_schedule = get_schedule
+        self.channel_numbers = [int(number) for number in channel_numbers]
+        self.lookahead = int(float(lookahead_minutes or os.getenv("PREFETCH_LOOKAHEAD_MINUTES", 10)) * MINUTE)
+        self.lookahead_items = int(lookahead_items or os.getenv("PREFETCH_LOOKAHEAD_ITEMS", 8))
+        self.head_bytes = int(float(head_mb or os.getenv("PREFETCH_HEAD_MB", 8)) * MB)
+        self.budget = int(float(budget_mb or os.getenv("PREFETCH_BUDGET_MB", 256)) * MB)
+        self.interval = float(interval or os.getenv("PREFETCH_INTERVAL", 30))
+        self.current = None
+        self.warmed = OrderedDict()
+        self.warmed_bytes = 0
+        self.stats = {"warmed": 0, "warmed_bytes": 0, "evicted": 0, "missing": 0}
+        self.stopped = threading.Event()
+
+    def tuned(self, channel_number):
+        self.current = int(channel_number)
+
+    def stop(self):
+        self.stopped.set()
+
+    def upcoming(self, channel_number, now):
+        # Items airing now or starting within the lookahead, at most lookahead_items of them
+        timeline = self.get_schedule(channel_number)
+        i = timeline.index_at(now)
+        if i is None:
+            i = timeline.next_index(now)
+        if i is None:
+            return []
+        items = timeline.items[i:i + self.lookahead_items]
+        return [item for item in items if item["start"] <= now + self.lookahead]
+
+    def tick(self):
+        # Returns seconds until the soonest upcoming item starts, so the next pass lands just after it
+        now = now_ms()
+        channels = sorted(self.channel_numbers, key=lambda number: number != self.current)
+        next_start = None
+        airs = {}
+        protected = set()
+        for channel_number in channels:
+            if self.stopped.is_set():
+                return None
+            items = self.upcoming(channel_number, now)
+            if channel_number == self.current:
+                protected.update(item["filepath"] for item in items[:2])
+            for item in items:
+                self.warm(item["filepath"])
+                airs[item["filepath"]] = min(item["start"], airs.get(item["filepath"], item["start"]))
+                if item["start"] > now and (next_start is None or item["start"] < next_start):
+                    next_start = item["start"]
+        self.evict(airs, protected)
+        return None if next_start is None else max(1, (next_start - now_ms()) / SECOND)
+
+    def warm(self, path):
+        if path in self.warmed:
+            self.warmed.move_to_end(path)
+            return
+
+        # stat keeps the directory entry and inode cached, short files are warmed whole
+        try:
+            size = os.stat(path).st_size
+        except OSError:
+            self.stats["missing"] += 1
+            return
+        length = min(size, self.head_bytes)
+        if warm_range(path, 0, length):
+            self.warmed[path] = length
+            self.warmed_bytes += length
+            self.stats["warmed"] += 1
+            self.stats["warmed_bytes"] += length
+
+    def evict(self, airs=None, protected=()):
+        # Files nothing upcoming needs go first, least recently warmed first, then upcoming files
+        # furthest from airing. airs maps path to its next start
+        airs = airs or {}
+        if self.warmed_bytes <= self.budget:
+            return
+        victims = sorted((path for path in self.warmed if path not in protected), key=lambda path: (path in airs, -airs.get(path, 0)))
+        for path in victims:
+            if self.warmed_bytes <= self.budget:
+                break
+            length = self.warmed.pop(path)
+            drop_range(path, 0, length)
+            self.warmed_bytes -= length
+            self.stats["evicted"] += 1
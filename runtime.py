@@ -0,0 +1,372 @@
+import time
+boot_time = time.monotonic()
+
+import asyncio
+import atexit
+import functools
+import logging
+import os
+import signal
+import sys
+import termios
+import tty
+import uvicorn
+from dotenv import load_dotenv
+import metrics
+import scheduler_v4
+from drift import DriftSync
+from edl import SlotTimelines, snap_slot_offset
+from horizon import HorizonScheduler
+from lazy_schedule import LazySchedule
+from media_cache import MediaCache
+from player import SystemClock, create_player
+from playlist import PlaylistWindow
+from prefetch import Prefetcher
+from schedule_cache import ScheduleCache
+from standby import StandbyManager
+from timeline import SECOND, DAY, ChannelTimeline, format_ms
+
+# Classes
+class ChannelState:
+    # Tuned channel, only ever changed on the event loop. generation counts changes so the
+    # playout task can tell a new tune from the same channel picked again.
+    def __init__(self, channel_numbers, number=None):
+        self.channel_numbers = [int(n) for n in channel_numbers]
+        self.number = int(number or self.channel_numbers[0])
+        self.generation = 0
+        self.changed = asyncio.Event()
+
+    def set(self, number):
+        number = int(number)
+        if number not in self.channel_numbers:
+            raise ValueError(f"No channel {number}")
+        self.number = number
+        self.generation += 1
+        self.changed.set()
+
+    def step(self, amount):
+        i = self.channel_numbers.index(self.number)
+        self.set(self.channel_numbers[(i + amount) % len(self.channel_numbers)])
+
+class Runtime:
+    # Keyboard, API, mpv events, playout and every background job as tasks on one asyncio loop.
+    # Blocking work (schedule generation, disk warming, mpv commands) runs in the default executor.
+    # Every wait goes through clock, which the simulator swaps for a VirtualClock.
+    def __init__(self, player=None, channel_number=1, clock=None):
+        self.player = player or create_player()
+        self.channel_number = channel_number
+        self.clock = clock or SystemClock()
+        self.playlist_window = PlaylistWindow(self.player)
+        self.slot_timelines = SlotTimelines()
+        self.tune_in_mode = os.getenv("TUNE_IN_MODE", "start")
+        self.tune_started = None
+        self.first_frame_reported = False
+        self.lazy_schedules = {}
+        self.schedule_cache = None
+        self.horizon = None
+        self.standby = None
+        self.prefetcher = None
+        self.media_cache = None
+        self.jobs = {}
+        self.tasks = []
+        self.loop = None
+        self.state = None
+        self.wake = None
+        self.server = None
+        self.stats = {"tunes": 0, "misses": 0, "desyncs": 0}
+
+    # Schedules
+    def get_schedule(self, channel_number):
+        if self.lazy_schedules:
+            now = self.clock.now_ms()
+            rows = self.lazy_schedules[str(channel_number)].items_between(now, now + DAY)
+            return ChannelTimeline(scheduler_v4.row_to_item(row) for row in rows)
+        return self.schedule_cache.timeline(channel_number)
+
+    def get_playout_schedule(self, channel_number):
+        schedule = self.get_schedule(channel_number)
+        if self.slot_timelines.enabled():
+            return self.slot_timelines.get(str(channel_number), schedule)
+        return schedule
+
+    def following_item(self, channel_number):
+        def next_item(item):
+            return self.get_playout_schedule(channel_number).next_item(item["start"])
+        return next_item
+
+    def setup(self):
+        # Reuse or regenerate stored schedules, then bootstrap just the tuned channel
+        self.channels = scheduler_v4.import_channel_data()
+        channel_numbers = [channel.number for channel in self.channels]
+        if os.getenv("SCHEDULE_MODE", "stored") == "deterministic":
+            self.lazy_schedules = {channel.number: LazySchedule(channel) for channel in self.channels}
+        else:
+            scheduler_v4.initialize_schedule_db()
+            catalog_version = scheduler_v4.get_catalog_version()
+            for channel in self.channels:
+                if not scheduler_v4.schedule_is_current(channel, catalog_version):
+                    logging.info(f"Regenerating schedule for channel {channel.number}")
+                    scheduler_v4.clear_schedule_table(channel.number)
+                else:
+                    logging.info(f"Reusing stored schedule for channel {channel.number}")
+            self.schedule_cache = ScheduleCache(channel_numbers)
+            self.schedule_cache.attach()
+            self.schedule_cache.preload()
+            self.horizon = HorizonScheduler(self.channels)
+            self.horizon.bootstrap(self.channel_number)
+
+        self.standby = StandbyManager(self.get_schedule, channel_numbers)
+        self.prefetcher = Prefetcher(self.get_schedule, channel_numbers)
+        self.media_cache = MediaCache(self.get_schedule, channel_numbers)
+        self.drift_sync = DriftSync(self.player, self.playlist_window, self.get_playout_schedule, lambda: self.state.number, clock=self.clock)
+        if self.media_cache.enabled():
+            self.playlist_window.resolve = self.media_cache.resolve
+            self.media_cache.in_use = self.playlist_window.paths
+            os.makedirs(self.media_cache.cache_dir, exist_ok=True)
+            atexit.register(lambda: logging.info(f"Media cache: {self.media_cache.report()}"))
+        if os.getenv("DRIFT_SYNC", "on") == "on":
+            atexit.register(lambda: logging.info(f"Drift: {self.drift_sync.stats}"))
+        logging.info(f"Startup schedule ready in {(time.monotonic() - boot_time) * 1000:.0f} ms")
+
+    # Event loop
+    async def main(self):
+        self.loop = asyncio.get_running_loop()
+        self.wake = asyncio.Event()
+        await self.loop.run_in_executor(None, self.setup)
+
+        # Ctrl+C and SIGTERM stop every task so the terminal is restored and atexit dumps run.
+        # uvicorn takes the signals over while it serves, then restores these and re-raises.
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            self.loop.add_signal_handler(sig, self.shutdown)
+
+        tasks = [self.start_playout()]
+        if self.horizon:
+            tasks.append(self.start_job("horizon", self.horizon.tick, self.horizon.interval))
+        if self.standby.enabled():
+            tasks.append(self.start_job("standby", self.standby.tick, None))
+        if os.getenv("PREFETCH", "on") == "on":
+            tasks.append(self.start_job("prefetch", self.prefetcher.tick, self.prefetcher.interval))
+        if self.media_cache.enabled():
+            tasks.append(self.start_job("media_cache", self.media_cache.tick, self.media_cache.interval))
+        if os.getenv("DRIFT_SYNC", "on") == "on":
+            tasks.append(self.start_job("drift", self.drift_sync.tick, self.drift_sync.interval))
+        if os.getenv("API", "on") == "on":
+            tasks.append(asyncio.create_task(self.serve_api(), name="api"))
+        self.tasks = tasks
+        self.attach_keyboard()
+
+        try:
+            await asyncio.gather(*tasks)
+        except asyncio.CancelledError:
+            # Let uvicorn finish its own graceful shutdown
+            api_tasks = [task for task in tasks if task.get_name() == "api" and not task.done()]
+            if api_tasks:
+                await asyncio.wait(api_tasks, timeout=5)
+            logging.info(f"Playout stopped: {self.stats}")
+        finally:
+            self.detach_keyboard()
+
+    def start_playout(self):
+        self.state = ChannelState([channel.number for channel in self.channels], self.channel_number)
+
+        # mpv calls back on its own thread, hop onto the loop before touching anything
+        for name in ("file-loaded", "end-file", "playback-restart"):
+            self.player.event_callback(name)(functools.partial(self.from_player, name))
+        return asyncio.create_task(self.playout(), name="playout")
+
+    def shutdown(self):
+        # Cancelling a job task leaves its executor call running and asyncio.run joins it on the way
+        # out, so the services are told to stop too and give up long work (a copy, a horizon pass)
+        if self.server:
+            self.server.should_exit = True
+        for service in (self.horizon, self.standby, self.prefetcher, self.media_cache):
+            if service:
+                service.stop()
+        for task in self.tasks:
+            if task.get_name() != "api":
+                task.cancel()
+
+    def from_player(self, name, event):
+        self.loop.call_soon_threadsafe(self.on_player_event, name)
+
+    def on_player_event(self, name):
+        if name == "file-loaded":
+            metrics.mark("file_loaded")
+        elif name == "playback-restart":
+            if self.tune_started is not None:
+                elapsed = (time.monotonic() - self.tune_started) * 1000
+                logging.info(f"Tune-in to picture ({self.tune_in_mode}): {elapsed:.0f} ms")
+                metrics.record(f"tune_in.{self.tune_in_mode}", elapsed)
+                self.tune_started = None
+            metrics.end_zap()
+            if not self.first_frame_reported:
+                self.first_frame_reported = True
+                logging.info(f"Time to first frame: {(time.monotonic() - boot_time) * 1000:.0f} ms")
+        self.wake.set()
+
+    # Channel commands, from the keyboard or the API
+    def change_channel(self, number=None, step=None):
+        if step is not None:
+            self.state.step(step)
+        else:
+            self.state.set(number)
+        metrics.begin_zap(self.state.number)
+        logging.info(f"Channel changed to {self.state.number}")
+        self.show_osd("none", "")
+        if self.horizon:
+            self.horizon.prioritize(self.state.number)
+            self.poke("horizon")
+        self.wake.set()
+        return self.state.number
+
+    def attach_keyboard(self):
+        self.old_settings = None
+        if not sys.stdin.isatty():
+            return
+        self.old_settings = termios.tcgetattr(sys.stdin)
+        tty.setcbreak(sys.stdin.fileno())
+        self.loop.add_reader(sys.stdin.fileno(), self.on_key)
+
+    def detach_keyboard(self):
+        if self.old_settings is not None:
+            self.loop.remove_reader(sys.stdin.fileno())
+            termios.tcsetattr(sys.stdin, termios.TCSADRAIN, self.old_settings)
+
+    def on_key(self):
+        key = os.read(sys.stdin.fileno(), 1).decode(errors="ignore")
+        if key == "s":
+            self.change_channel(step=1)
+        elif key == "w":
+            self.change_channel(step=-1)
+
+    async def serve_api(self):
+        # Same FastAPI app, served on this loop so its endpoints can reach the runtime directly
+        import api
+        api.app.state.runtime = self
+        config = uvicorn.Config(api.app, host="0.0.0.0", port=int(os.getenv("API_PORT", 8000)), log_level="info")
+        self.server = uvicorn.Server(config)
+        await self.server.serve()
+
+    # Playout
+    async def wait_until(self, deadline):
+        # Sleep until the deadline in epoch ms, or until a channel change or mpv event wakes us
+        await self.clock.wait(self.wake, deadline)
+        self.wake.clear()
+
+    async def run_blocking(self, fn, *args, **kwargs):
+        return await self.loop.run_in_executor(None, functools.partial(fn, *args, **kwargs))
+
+    async def playout(self):
+        tuned = None
+        missing = False
+        while True:
+            channel_number = self.state.number
+            generation = self.state.generation
+
+            # Deterministic mode generates windows and EDL mode compiles slots here, keep it off the loop
+            schedule = await self.run_blocking(self.get_playout_schedule, channel_number)
+            now = self.clock.now_ms()
+            started = time.perf_counter()
+            playing_now_index = schedule.index_at(now)
+            metrics.record("playout.lookup_us", (time.perf_counter() - started) * 1000 * 1000)
+            metrics.mark("schedule")
+            if playing_now_index is None:
+                upcoming = schedule.next_item(now)
+                if upcoming and upcoming["start"] - now < SECOND:
+                    await self.wait_until(upcoming["start"])
+                    continue
+                # Counted and logged once per stretch, the scheduler is poked every second of it
+                if not missing:
+                    logging.info(f"Nothing scheduled on channel {channel_number} right now, waiting for the scheduler")
+                    self.stats["misses"] += 1
+                    missing = True
+                self.poke("horizon")
+                await self.wait_until(now + SECOND)
+                continue
+            playing_now = schedule.items[playing_now_index]
+            missing = False
+
+            queued = self.playlist_window.current()
+            if tuned != generation or not queued or queued["start"] != playing_now["start"]:
+                # Same tune but mpv is on another item, it ran out or fell behind the schedule
+                if tuned == generation:
+                    self.stats["desyncs"] += 1
+                self.stats["tunes"] += 1
+                logging.info(f"Currently playing: {playing_now['name']}\tStart: {format_ms(playing_now['start'])}\tEnd: {format_ms(playing_now['end'])}")
+                await self.tune(channel_number, playing_now, now - playing_now["start"])
+                tuned = generation
+
+            while now < playing_now["end"] and self.state.generation == generation:
+                await self.wait_until(playing_now["end"])
+                now = self.clock.now_ms()
+
+    async def tune(self, channel_number, item, offset):
+        self.tune_started = time.monotonic()
+        await self.run_blocking(self.load, channel_number, item, offset)
+        self.standby.tuned(channel_number)
+        self.prefetcher.tuned(channel_number)
+        self.drift_sync.retuned()
+        self.poke("standby")
+        self.poke("prefetch")
+        self.show_channel(channel_number)
+
+    def load(self, channel_number, item, offset):
+        # Replace the playlist with the airing item and the next few after it, runs in the executor
+        if self.tune_in_mode == "seek":
+            self.playlist_window.retune(item, self.following_item(channel_number))
+            self.player.wait_for_property("duration")
+            logging.debug(f"Seeking {offset / SECOND}s")
+            self.player.time_pos = int(offset / SECOND)
+            metrics.mark("seek")
+        else:
+            # Open the file at the offset, from the keyframe before it when the catalog knows where that is
+            start = snap_slot_offset(item, offset)
+            logging.debug(f"Starting at {start / SECOND:.3f}s (offset {offset / SECOND:.3f}s)")
+            self.playlist_window.retune(item, self.following_item(channel_number), start=f"{start / SECOND:.3f}")
+
+    def show_channel(self, channel_number, font_name="Arial"):
+        ass_text = "{\\an1\\fs30\\b1\\alpha&H80&\\fn" + font_name + "}" + str(channel_number)
+        self.show_osd("ass-events", ass_text)
+
+    def show_osd(self, format, text):
+        try:
+            self.player.command("osd-overlay", 0, format, text)
+        except Exception as e:
+            logging.info(f"OSD error: {e}")
+
+    # Background jobs
+    def start_job(self, name, fn, interval):
+        self.jobs[name] = asyncio.Event()
+        return asyncio.create_task(self.periodic(name, fn, interval), name=name)
+
+    def poke(self, name):
+        if name in self.jobs:
+            self.jobs[name].set()
+
+    async def periodic(self, name, fn, interval):
+        # The one scheduling path for background services. fn runs in the executor and may return
+        # seconds until it next wants to run, a None interval sleeps until poked
+        wake = self.jobs[name]
+        while True:
+            timeout = interval
+            try:
+                result = await self.run_blocking(fn)
+                if result is not None:
+                    timeout = result if interval is None else min(interval, result)
+            except Exception as e:
+                logging.exception(f"Background job {name} failed: {e}")
+            await self.clock.wait(wake, None if timeout is None else self.clock.now_ms() + int(timeout * SECOND))
+            wake.clear()
+
+# Functions
+def main():
+    load_dotenv()
+    runtime = Runtime()
+    atexit.register(metrics.dump)
+    try:
+        asyncio.run(runtime.main())
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import scheduler_v4
+import logging
+import threading
+from timeline import ChannelTimeline, now_ms
+
+# Far enough ahead to cover any horizon
+FOREVER = 2 ** 62
+
+# Classes
+class ScheduleCache:
+    # Parsed timeline of every channel held in the player process, so zapping never touches SQLite.
+    # Writers swap in a new timeline per update, readers just keep whatever timeline they were handed.
+    def __init__(self, channel_numbers):
+        self.channel_numbers = [str(number) for number in channel_numbers]
+        self.timelines = {number: ChannelTimeline() for number in self.channel_numbers}
+        self.lock = threading.Lock()
+
+    def attach(self):
+        # Follow every export, clear and trim the scheduler makes from now on
+        if self.on_schedule_event not in scheduler_v4.schedule_listeners:
+            scheduler_v4.schedule_listeners.append(self.on_schedule_event)
+
+    def detach(self):
+        if self.on_schedule_event in scheduler_v4.schedule_listeners:
+            scheduler_v4.schedule_listeners.remove(self.on_schedule_event)
+
+    def preload(self):
+        now = now_ms()
+        for number in self.channel_numbers:
+            self.reload(number, now)
+        logging.info(f"Schedule cache holds {sum(len(t) for t in self.timelines.values())} items for {len(self.timelines)} channels")
+
+    def reload(self, channel_number, since=None):
+        rows = scheduler_v4.items_between(channel_number, now_ms() if since is None else since, FOREVER)
+        with self.lock:
+            self.timelines[str(channel_number)] = ChannelTimeline(scheduler_v4.row_to_item(row) for row in rows)
+
+    def timeline(self, channel_number):
+        return self.timelines.get(str(channel_number)) or ChannelTimeline()
+
+    def on_schedule_event(self, event, channel_number, payload):
+        with self.lock:
+            match event:
+                case "append":
+                    self.append(str(channel_number), payload)
+                case "clear":
+                    numbers = self.channel_numbers if channel_number is None else [str(channel_number)]
+                    for number in numbers:
+                        self.timelines[number] = ChannelTimeline()
+                case "trim":
+                    for number, timeline in self.timelines.items():
+                        self.timelines[number] = ChannelTimeline(item for item in timeline.items if item["end"] >= payload)
+
+    def append(self, channel_number, rows):
+        # New rows usually continue the timeline, anything overlapping replaces what was there
+        items = [scheduler_v4.row_to_item(row) for row in rows]
+        if not items:
+            return
+        items.sort(key=lambda item: item["start"])
+        kept = [item for item in self.timeline(channel_number).items if item["end"] <= items[0]["start"]]
+        self.timelines[channel_number] = ChannelTimeline(kept + items)
@@ -11,9 +11,9 @@ from datetime import datetime, timedelta
 import random
 import time
 import json
-import subprocess
-import tempfile
 import glob
+import bumpers
+from timeline import to_ms
 
 # Logging settings
 logging.basicConfig(
@@ -270,10 +270,9 @@ class TVMarathonStrategy:
                 None,
                 None,
                 5, 
-                create_bumper(chosen_episodes[0])
+                create_bumper(chosen_episodes[0], slot.end)
             )
             logging.info(f"Created bumper: {bumper.filepath}")
-            time.sleep(1)
 
             # Add commercials post episode
             all_commercials = [c for c in self.all_content if c.type == "commercial"]
@@ -341,7 +340,7 @@ class Strategy:
                 None,
                 None,
                 5, 
-                create_bumper(self.media[0])
+                create_bumper(self.media[0], slot.end)
             )
 
             # Add commercials post episode
@@ -361,30 +360,10 @@ class Strategy:
 
 
 # Functions
-def create_bumper(content):
-    if hasattr(content, 'show_name'):
-        text = f"Up Next: {content.show_name}"
-    else:
-        text = f"Up Next: {content.name}"
-
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".txt") as f:
-        f.write(text.encode("utf-8"))
-        textfile = f.name
-
-    cmd = [
-        "ffmpeg", "-y",
-        "-stream_loop", "-1", "-i", "backgroundvideo.mp4",
-        "-t", "5",
-        "-vf",
-        f"drawtext=fontfile=/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf:"
-        f"textfile={textfile}:fontcolor=white:fontsize=48:"
-        f"x=(w-text_w)/2:y=h-100:shadowcolor=black:shadowx=2:shadowy=2",
-        "-c:v", "libx264", "-pix_fmt", "yuv420p", "-an", f"./bumpers/{datetime.strftime(content.start, '%H-%M')}.mp4"
-    ]
-
-    subprocess.run(cmd, check=True)
-    os.unlink(textfile)
-    return f"{datetime.strftime(content.start, '%H-%M')}.mp4"
+def create_bumper(content, airs_until=None):
+    # Queued on the bumper service, the returned path is filled in before the slot airs
+    # and kept in the cache at least until the slot is over
+    return bumpers.get_service().request(content, airs_until=to_ms(airs_until) if airs_until else None)
 
 def get_all_episodes_from_db():
     with sqlite3.connect(os.getenv("CATALOG_DB")) as conn:
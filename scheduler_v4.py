@@ -5,10 +5,14 @@ from rich.table import Table
 from rich.logging import RichHandler
 from dotenv import load_dotenv
 import os
-from datetime import datetime, timedelta
 import random
-import time
 import json
+import hashlib
+from compact_catalog import CatalogBuilder
+from selection import RuntimeSelector
+from shufflebag import ShuffleBag
+from catalog_index import EpisodeIndex, TagIndex
+from timeline import SECOND, MINUTE, HOUR, DAY, HALF_HOUR, now_ms, format_ms, align_up, day_start, slot_size
 
 # Logging settings
 logging.basicConfig(
@@ -24,6 +28,14 @@ load_dotenv()
 
 # Global Vars
 console = Console()
+catalog = None
+episode_index = None
+tag_index = None
+min_repeat_distance = int(os.getenv("MIN_REPEAT_DISTANCE", 20))
+
+# Callables told about every schedule write as listener(event, channel_number, payload),
+# event is "append" with the new rows, "clear" or "trim" with the cutoff time
+schedule_listeners = []
 
 # Classes
 class Content:
@@ -102,113 +114,118 @@ class Slot:
     def __init__(self, start, content=None):
         self.start = start
         self.content = content
-        self.size = self.determine_slot_size()
-        self.end = self.start + timedelta(minutes=self.size)
-        self.comm_time_total = (self.size - (int(float(self.content.runtime)) / 60)) * 60
+        self.size = slot_size(self.content.runtime_ms)
+        self.end = self.start + self.size
+        self.comm_time_total = self.size - self.content.runtime_ms
         self.commercials = []
 
-    def determine_slot_size(self):
-        runtime = int(float(self.content.runtime))
-        match runtime:
-            case _ if (runtime / 60) < 30:
-                return 30
-            case _ if (runtime / 60) > 30 and (runtime / 60) < 60:
-                return 60
-            case _ if (runtime / 60) > 60 and (runtime / 60) < 90:
-                return 90
-            case _ if (runtime / 60) > 90 and (runtime / 60) < 120:
-                return 120
-            case _ if (runtime / 60) > 120 and (runtime / 60) < 180:
-                return 180
-            case _ if (runtime / 60) > 180 and (runtime / 60) < 240:
-                return 240
-
-    def fill_commercials(self, all_commercials, channel_number, tolerance=5, min_padding=5, max_padding=20):
+    def fill_commercials(self, pools, channel, tolerance=5 * SECOND, min_padding=5, max_padding=20):
         marker = self.content.end
         slot_end = get_next_half_hour(marker)
-        # logging.info(f"Marker: {marker} - Slot End: {slot_end}")
-        # total = timedelta()
-
-        while marker + timedelta(seconds=tolerance) < slot_end:
-            # Get all commercials that fit
-            candidates = [
-                m for m in all_commercials
-                if timedelta(seconds=round(int(float(m.runtime)), 2)) <= (slot_end - marker) + timedelta(seconds=tolerance)
-            ]
-
-            # Select and add random commercial
-            random.shuffle(candidates)
-            commercial = candidates[0]
-            runtime = round(int(float(commercial.runtime)), 2)
+        runtimes = pools.catalog.runtime_ms
+        # logging.info(f"Marker: {format_ms(marker)} - Slot End: {format_ms(slot_end)}")
+
+        while marker + tolerance < slot_end:
+            # Draw a random commercial that fits
+            limit = slot_end - marker + tolerance
+            row = pools.commercials.draw(lambda r: runtimes[r] <= limit)
+            if row is None:
+                break
+
+            commercial = pools.catalog.view(row)
             commercial.start = marker
-            commercial.end = marker + timedelta(seconds=runtime)
+            commercial.end = marker + commercial.runtime_ms
             self.commercials.append(commercial)
-            export_commercial_to_db(commercial, channel_number)
-            marker = marker + timedelta(seconds=runtime)
-            candidates.pop(0)
+            channel.pending.append(commercial_row(commercial, channel.number))
+            marker = commercial.end
         
         time_remaining = slot_end - marker
-        logging.debug(f"There is {time_remaining.total_seconds()}s left on the final commercial add")
+        logging.debug(f"There is {time_remaining / SECOND}s left on the final commercial add")
 
-        if time_remaining > timedelta(seconds=0):
+        if time_remaining > 0:
             best = None
             best_diff = float("inf")
-            for c in all_commercials:
-                runtime = round(int(float(c.runtime)), 2)
-                diff = abs(time_remaining.total_seconds() - runtime)
-                if diff < best_diff and runtime <= time_remaining.total_seconds() + tolerance:
-                    best = c
+            for r in pools.commercials.items:
+                runtime = int(runtimes[r])
+                diff = abs(time_remaining - runtime)
+                if diff < best_diff and runtime <= time_remaining + tolerance and not pools.commercials.is_recent(r):
+                    best = r
                     best_diff = diff
-            if best:
-                runtime = round(int(float(best.runtime)), 2)
+            if best is not None:
+                pools.commercials.remember(best)
+                best = pools.catalog.view(best)
                 best.start = marker
-                best.end = marker + timedelta(seconds=runtime)
+                best.end = marker + best.runtime_ms
                 self.commercials.append(best)
                 marker = best.end
-                export_commercial_to_db(best, channel_number)
+                channel.pending.append(commercial_row(best, channel.number))
                 
         return marker
                 
 
 class Channel:
-    def __init__(self, name, number, description, strategies):
+    def __init__(self, name, number, description, strategies, config_hash=None, seed=None):
         self.name = name
         self.number = number
         self.description = description
         self.strategies = strategies
+        self.config_hash = config_hash
+        self.seed = seed
         self.schedule = []
+        self.pending = []
+        self.pools = None
+        self.last_strategy = None
+
+class ContentPools:
+    # Shuffle bags of catalog rows shared by every strategy on a channel, along with
+    # the random source every strategy draws from so seeded runs are reproducible
+    def __init__(self, catalog, min_repeat_distance=0, rng=None):
+        self.catalog = catalog
+        self.rng = rng or random
+        self.commercials = ShuffleBag(catalog.indices(catalog.mask_type("commercial")), min_repeat_distance, self.rng)
+        self.movies = ShuffleBag(catalog.indices(catalog.mask_type("movie")), min_repeat_distance, self.rng)
+        self.music_videos = ShuffleBag(catalog.indices(catalog.mask_type("musicvideo")), min_repeat_distance, self.rng)
+        self.idents = ShuffleBag(catalog.indices(catalog.mask_type("ident") & catalog.mask_tag("mtvident")), min_repeat_distance, self.rng)
 
 class MovieTagStrategyMethod:
-    def __init__(self, all_content, tags):
-        self.all_content = all_content
+    def __init__(self, tag_index, pools, tags=None):
+        self.tag_index = tag_index
+        self.pools = pools
         self.tags = tags
 
     def generate_slots(self, start, duration, channel):
         slots = []
         marker = start
-        total = timedelta()
+        total = 0
+        aired = set()
 
-        # Filter Movies by Tag
-        movies = [m for m in self.all_content if m.type == "movie"]
-        movies = [m for m in movies if [t for t in self.tags if t in m.tags]]
-        random.shuffle(movies)
+        # Pick a theme for the block unless the channel asked for specific tags
+        if not self.tags:
+            themes = [t for t in self.tag_index.tag_names(min_count=3) if t != "movie"]
+            self.tags = [self.pools.rng.choice(themes)] if themes else ["movie"]
+        logging.info(f"Movie block tags: {self.tags}")
+        movies = self.tag_index.selector(*self.tags)
 
         while total < duration:
-            movie = movies[0]
-            runtime = round(int(float(movie.runtime)), 2)
+            # Prefer a movie that fits the rest of the block, otherwise run over like before
+            row = movies.pick_under(duration - total, exclude=aired, rng=self.pools.rng)
+            if row is None:
+                row = movies.pick(exclude=aired, rng=self.pools.rng)
+            if row is None:
+                break
+            aired.add(row)
+            movie = self.pools.catalog.view(row)
             movie.start = marker
-            movie.end = marker + timedelta(seconds=runtime)
+            movie.end = marker + movie.runtime_ms
             slot = Slot(movie.start, movie)
-            export_movie_to_db(movie, channel.number)
+            channel.pending.append(movie_row(movie, channel.number))
 
             # Add commercials
-            all_commercials = [m for m in self.all_content if m.type == "commercial"]
-            marker = slot.fill_commercials(all_commercials, channel.number)
+            marker = slot.fill_commercials(self.pools, channel)
 
-            # Append slot, pop Content
+            # Append slot
             slots.append(slot)
-            total += timedelta(minutes=slot.size)
-            movies.pop(0)
+            total += slot.size
 
             # logging.info(f"Marker at end of slot fulfillment: {marker}")
             # logging.info(f"{total=} - {duration=}")
@@ -216,197 +233,201 @@ class MovieTagStrategyMethod:
         return slots, marker
 
 class TVMarathonStrategyMethod:
-    def __init__(self, all_content, series=None, episodes=None):
-        self.all_content = all_content
+    def __init__(self, episode_index, pools, series=None, resume=True):
+        self.episode_index = episode_index
+        self.pools = pools
+        self.series = series
+        self.resume = resume
 
     def generate_slots(self, start, duration, channel):
         slots = []
         marker = start
-        total = timedelta()
-
-        self.series = random.choice([s.show_name for s in self.all_content if s.type == 'tv' and s.show_name])
-        self.episodes = [e for e in [s for s in self.all_content if s.type == 'tv'] if e.show_name == self.series]
+        total = 0
 
-        # Sort episodes by Season and Episode Numbers
-        sorted_episodes = sorted(self.episodes, key=lambda x: (int(x.season_number), int(x.episode_number)))
+        if self.series is None:
+            self.series = self.pools.rng.choice(self.episode_index.show_names())
 
-        # Pick a random episode and get the next 20 number of leading episodes
-        starting_episode = random.choice(sorted_episodes)
-        starting_episode_index = sorted_episodes.index(starting_episode)
-        self.episodes = sorted_episodes[starting_episode_index:starting_episode_index+20]
+        # Resume where the last marathon of this show left off, otherwise pick a random episode
+        progress = get_marathon_progress(channel.number, self.series) if self.resume else None
+        if progress:
+            position = self.episode_index.position_of(self.series, *progress)
+        else:
+            position = self.pools.rng.randrange(self.episode_index.count(self.series))
 
         while total < duration:
-            episode = self.episodes[0]
-            runtime = round(int(float(episode.runtime)))
+            episode = self.pools.catalog.view(self.episode_index.episode_at(self.series, position))
             episode.start = marker
-            episode.end = marker + timedelta(seconds=runtime)
+            episode.end = marker + episode.runtime_ms
             slot = Slot(episode.start, episode)
-            export_tv_to_db(episode, channel.number)
+            channel.pending.append(tv_row(episode, channel.number))
 
             # Add commercials
-            all_commercials = [m for m in self.all_content if m.type == "commercial"]
-            marker = slot.fill_commercials(all_commercials, channel.number)
+            marker = slot.fill_commercials(self.pools, channel)
 
-            # Append slot, pop Content
+            # Append slot, move on to the next episode
             slots.append(slot)
-            total += timedelta(minutes=slot.size)
-            self.episodes.pop(0)
+            total += slot.size
+            position += 1
 
             # logging.info(f"Marker at end of slot fulfillment: {marker}")
             # logging.info(f"{total=} - {duration=}")
 
+        # Remember the next episode for the following marathon
+        if self.resume:
+            # Raw catalog numbers, unnumbered episodes keep their -1 instead of becoming NULL
+            row = self.episode_index.episode_at(self.series, position)
+            save_marathon_progress(channel.number, self.series, int(self.pools.catalog.season[row]), int(self.pools.catalog.episode[row]))
+
         return slots, marker
 
 class PPVStrategyMethod:
-    def __init__(self, all_content):
-        self.all_content = all_content
+    def __init__(self, pools, day_rng=None):
+        self.pools = pools
+        self.day_rng = day_rng
+
+    def pick_movie(self, start):
+        # day_rng(day) gives the same movie for every window of a day, otherwise draw from the bag
+        if self.day_rng is None:
+            return self.pools.movies.draw()
+        return ppv_movie(self.pools.catalog, self.day_rng(day_start(start)))
 
     def generate_slots(self, start, duration, channel):
         slots = []
         marker = start
-        total = timedelta()
+        total = 0
 
         # Select movie
-        movie = random.choice([m for m in self.all_content if m.type == "movie"])
-        runtime = timedelta(seconds=round(int(float(movie.runtime)), 2))
+        row = self.pick_movie(start)
+        if row is None:
+            logging.info("No movies in the Catalog")
+            return slots, marker
+        movie = self.pools.catalog.view(row)
+        runtime = movie.runtime_ms
 
         while total < duration:
             movie.start = marker
             movie.end = marker + runtime
             marker = movie.end
             slots.append(Slot(movie.start, movie))
-            export_movie_to_db(movie, channel.number)
+            channel.pending.append(movie_row(movie, channel.number))
             total += runtime
 
         return slots, marker
 
 class MTVStrategyMethod:
-    def __init__(self, all_music_videos):
-        self.all_music_videos = all_music_videos
+    def __init__(self, pools):
+        self.pools = pools
 
     def generate_slots(self, start, duration, channel):
         logging.info("Starting MTV Strategy")
+        catalog = self.pools.catalog
         marker = start
-        total = timedelta()
+        total = 0
         counter = 0
-        video_amount = random.randint(3, 5)
-
-        # Shuffle all music videos
-        random.shuffle(self.all_music_videos)
+        video_amount = self.pools.rng.randint(3, 5)
 
         while total < duration:
-            mv = self.all_music_videos[0]
+            row = self.pools.music_videos.draw()
+            if row is None:
+                logging.info("No music videos in the Catalog")
+                break
+
+            mv = catalog.view(row)
             logging.debug(f"Inserting {mv.filepath} into schedule")
-            runtime = timedelta(seconds=round(int(float(mv.runtime)), 2))
+            runtime = mv.runtime_ms
             mv.start = marker
             mv.end = marker + runtime
 
-            export_music_video_to_db(mv, channel.number)
+            channel.pending.append(music_video_row(mv, channel.number))
             marker = mv.end
             total += runtime
             counter += 1
-            self.all_music_videos.pop(0)
             logging.debug(f"{counter=}")
-            # time.sleep(0.2)
-
-            # Refill Music Videos
-            if len(self.all_music_videos) == 0:
-                logging.debug(f"Refilling AMV: {len(self.all_music_videos)}")
-                time.sleep(0.2)
-                for m in get_all_music_videos_from_db():
-                    id, tags, runtime, filepath = m
-                    self.all_music_videos.append(Content(filepath, "musicvideo", None, None, tags, runtime, filepath))
-                random.shuffle(self.all_music_videos)            
 
             # Add commercials and idents
             if counter == video_amount:
                 # Select random number of commercials
-                commercial_amount = random.randint(2,4)
-                for c in random.sample(get_all_commercials_from_db(), commercial_amount):
-                    # Convert to Content objects and fill in metadata
-                    id, tags, runtime, filepath = c
-                    logging.debug(f"Inserting {filepath} into schedule")
-                    commercial = Content(filepath, "commercial", None, None, tags, runtime, filepath)
-                    runtime = timedelta(seconds=round(int(float(commercial.runtime))))
+                commercial_amount = self.pools.rng.randint(2,4)
+                for _ in range(commercial_amount):
+                    row = self.pools.commercials.draw()
+                    if row is None:
+                        break
+                    commercial = catalog.view(row)
+                    logging.debug(f"Inserting {commercial.filepath} into schedule")
+                    runtime = commercial.runtime_ms
                     commercial.start = marker
                     commercial.end = marker + runtime
                     total += runtime
                     marker = commercial.end
 
                     # Export commercial directly to schedule DB
-                    export_commercial_to_db(commercial, channel.number)
-
-                random_ident = random.choice(get_all_mtv_idents())
-                id, tags, runtime, filepath = random_ident
-                logging.debug(f"Inserting {filepath} into schedule")
-                ident = Content(filepath, "ident", None, None, tags, runtime, filepath)
-                runtime = timedelta(seconds=round(int(float(runtime))))
-                ident.start = marker
-                ident.end = marker + runtime
-                marker = ident.end
-                total += runtime
-                
-                export_commercial_to_db(ident, channel.number)
+                    channel.pending.append(commercial_row(commercial, channel.number))
+
+                row = self.pools.idents.draw()
+                if row is not None:
+                    ident = catalog.view(row)
+                    logging.debug(f"Inserting {ident.filepath} into schedule")
+                    runtime = ident.runtime_ms
+                    ident.start = marker
+                    ident.end = marker + runtime
+                    marker = ident.end
+                    total += runtime
+
+                    channel.pending.append(commercial_row(ident, channel.number))
 
                 # Reset counter
                 counter = 0
-                video_amount = random.randint(3, 5)
-                logging.debug(f"{total}/{duration}")
+                video_amount = self.pools.rng.randint(3, 5)
+                logging.debug(f"{total / HOUR:.2f}h/{duration / HOUR:.2f}h")
                 logging.debug(total < duration)
-                time.sleep(0.2)
 
         logging.debug("Outside of while loop - MTV")
-        # time.sleep(1)
-
-
-
-
+        return [], marker
 
 class BasicStrategyMethod:
-    def __init__(self, all_content):
-        self.all_content = all_content
+    def __init__(self, selector, pools):
+        self.selector = selector
+        self.pools = pools
         
     def generate_slots(self, start, duration, channel):
         slots = []
         marker = start
-        total = timedelta()
+        total = 0
+        aired = set()
 
         while total < duration:
             # Update time remaining
             time_remaining = duration - total
 
-            # Get all non-commercial media with a runtime less than time_remaining
-            random_media = [m for m in self.all_content if m.type != "commercial" and timedelta(seconds=round(int(float(m.runtime)), 2)) <= time_remaining]
-            if not random_media:
+            # Pick random non-commercial media with a runtime less than time_remaining
+            row = self.selector.pick_under(time_remaining, exclude=aired, rng=self.pools.rng)
+            if row is None:
                 # logging.info(f"Small time to fill: {time_remaining}")
-                marker = get_next_half_hour(marker)
+                # Always move on by at least one slot, a marker already on the grid would otherwise stay put
+                marker = get_next_half_hour(marker + 1)
                 # logging.info(f"Setting marker to {marker}")
                 break
-                
-            # Shuffle and choose random item
-            random.shuffle(random_media)
-            chosen_content = random_media[0]
+
+            chosen_content = self.selector.catalog.view(row)
+            aired.add(row)
 
             # Prepare content and create the Slot
-            runtime = round(int(float(chosen_content.runtime)), 2)
             chosen_content.start = marker
-            chosen_content.end = marker + timedelta(seconds=runtime)
+            chosen_content.end = marker + chosen_content.runtime_ms
             slot = Slot(chosen_content.start, chosen_content)
 
             # Export to DB
             if chosen_content.type == "tv":
-                export_tv_to_db(chosen_content, channel.number)
+                channel.pending.append(tv_row(chosen_content, channel.number))
             if chosen_content.type == "movie":
-                export_movie_to_db(chosen_content, channel.number)
+                channel.pending.append(movie_row(chosen_content, channel.number))
 
             # Add commercials
-            all_commercials = [m for m in self.all_content if m.type == "commercial"]
-            marker = slot.fill_commercials(all_commercials, channel.number)
+            marker = slot.fill_commercials(self.pools, channel)
 
-            # Append slot, pop Content
+            # Append slot
             slots.append(slot)
-            total += timedelta(minutes=slot.size)
-            self.all_content.pop(0)
+            total += slot.size
 
             # logging.info(f"Marker at end of slot fulfillment: {marker}")
             # logging.info(f"{total=} - {duration=}")
@@ -414,11 +435,17 @@ class BasicStrategyMethod:
         return slots, marker
 
 # Functions
+# Column order of a schedule row, matches what the row builders produce
+SCHEDULE_COLUMNS = "ChannelNumber, Name, ShowName, Season, Episode, Overview, Tags, Runtime, Filepath, Start, End"
+
 def initialize_schedule_db():
     logging.debug("Initializing Schedule DB")
     with sqlite3.connect(os.getenv("SCHEDULE_DB")) as conn:
         cursor = conn.cursor()
 
+        # WAL lets the player read while the scheduler thread writes
+        cursor.execute("PRAGMA journal_mode=WAL")
+
         query = """
             CREATE TABLE IF NOT EXISTS SCHEDULE(
                 ID INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -431,117 +458,184 @@ def initialize_schedule_db():
                 Tags TEXT,
                 Runtime TEXT,
                 Filepath TEXT,
-                Start TEXT,
-                End TEXT
+                Start INTEGER,
+                End INTEGER
+            );
+        """
+        cursor.execute(query)
+        migrate_schedule_times(cursor)
+
+        # Start and End are epoch milliseconds, so "what's on now" is an index range lookup
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_schedule_channel_start ON SCHEDULE(ChannelNumber, Start)")
+
+        query = """
+            CREATE TABLE IF NOT EXISTS MARATHON_PROGRESS(
+                ChannelNumber INTEGER,
+                ShowName TEXT,
+                Season INTEGER,
+                Episode INTEGER,
+                PRIMARY KEY (ChannelNumber, ShowName)
+            );
+        """
+        cursor.execute(query)
+
+        # Inputs each channel's stored schedule was generated from
+        query = """
+            CREATE TABLE IF NOT EXISTS SCHEDULE_META(
+                ChannelNumber INTEGER PRIMARY KEY,
+                CatalogVersion TEXT,
+                ConfigHash TEXT,
+                Updated TEXT
             );
         """
         cursor.execute(query)
         conn.commit()
     conn.close()
 
-def export_tv_to_db(content, channel_number):
+def migrate_schedule_times(cursor):
+    # Older schedule DBs keep Start and End as local time text, rebuild them as epoch milliseconds
+    columns = {row[1]: row[2] for row in cursor.execute("PRAGMA table_info(SCHEDULE)")}
+    if columns.get("Start") != "TEXT":
+        return
+
+    logging.info("Migrating SCHEDULE Start and End to epoch milliseconds")
+    cursor.execute("ALTER TABLE SCHEDULE RENAME TO SCHEDULE_TEXT")
+    cursor.execute("""
+        CREATE TABLE SCHEDULE(
+            ID INTEGER PRIMARY KEY AUTOINCREMENT,
+            ChannelNumber INTEGER,
+            Name TEXT,
+            ShowName TEXT,
+            Season INTEGER,
+            Episode INTEGER,
+            Overview TEXT,
+            Tags TEXT,
+            Runtime TEXT,
+            Filepath TEXT,
+            Start INTEGER,
+            End INTEGER
+        );
+    """)
+    cursor.execute("""
+        INSERT INTO SCHEDULE (ID, ChannelNumber, Name, ShowName, Season, Episode, Overview, Tags, Runtime, Filepath, Start, End)
+        SELECT ID, ChannelNumber, Name, ShowName, Season, Episode, Overview, Tags, Runtime, Filepath,
+            CAST(strftime('%s', Start, 'utc') AS INTEGER) * 1000,
+            CAST(strftime('%s', End, 'utc') AS INTEGER) * 1000
+        FROM SCHEDULE_TEXT
+    """)
+    cursor.execute("DROP TABLE SCHEDULE_TEXT")
+
+def get_schedule_meta(channel_number):
     with sqlite3.connect(os.getenv("SCHEDULE_DB")) as conn:
         cursor = conn.cursor()
-
-        cursor.execute(
-            "INSERT INTO SCHEDULE (ChannelNumber, Name, ShowName, Season, Episode, Overview, Tags, Runtime, Filepath, Start, End) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
-            (
-                channel_number,
-                content.name,
-                content.show_name,
-                content.season_number,
-                content.episode_number,
-                content.overview,
-                content.tags,
-                content.runtime,
-                content.filepath,
-                datetime.strftime(content.start, "%Y-%m-%d %H:%M:%S"),
-                datetime.strftime(content.end, "%Y-%m-%d %H:%M:%S")
-            )
-        )
-        conn.commit()
+        cursor.execute("SELECT CatalogVersion, ConfigHash FROM SCHEDULE_META WHERE ChannelNumber = ?", (channel_number,))
+        return cursor.fetchone()
     conn.close()
 
-def export_movie_to_db(content, channel_number):
+def save_schedule_meta(channel, catalog_version):
     with sqlite3.connect(os.getenv("SCHEDULE_DB")) as conn:
         cursor = conn.cursor()
-
         cursor.execute(
-            "INSERT INTO SCHEDULE (ChannelNumber, Name, ShowName, Season, Episode, Overview, Tags, Runtime, Filepath, Start, End) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
-            (
-                channel_number,
-                content.name,
-                None,
-                None,
-                None,
-                content.overview,
-                content.tags,
-                content.runtime,
-                content.filepath,
-                datetime.strftime(content.start, "%Y-%m-%d %H:%M:%S"),
-                datetime.strftime(content.end, "%Y-%m-%d %H:%M:%S")
-            )
+            "INSERT OR REPLACE INTO SCHEDULE_META (ChannelNumber, CatalogVersion, ConfigHash, Updated) VALUES (?, ?, ?, ?)",
+            (channel.number, catalog_version, channel.config_hash, format_ms(now_ms()))
         )
         conn.commit()
     conn.close()
 
-def export_commercial_to_db(content, channel_number):
+def schedule_is_current(channel, catalog_version):
+    # Stored schedule can be reused if it was built from the same inputs and still covers now
+    if get_schedule_meta(channel.number) != (catalog_version, channel.config_hash):
+        return False
+
+    return item_at(channel.number, now_ms()) is not None
+
+def get_marathon_progress(channel_number, show_name):
     with sqlite3.connect(os.getenv("SCHEDULE_DB")) as conn:
         cursor = conn.cursor()
-
         cursor.execute(
-            "INSERT INTO SCHEDULE (ChannelNumber, Name, ShowName, Season, Episode, Overview, Tags, Runtime, Filepath, Start, End) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
-            (
-                channel_number,
-                None,
-                None,
-                None,
-                None,
-                None,
-                "commercial",
-                content.runtime,
-                content.filepath,
-                datetime.strftime(content.start, "%Y-%m-%d %H:%M:%S"),
-                datetime.strftime(content.end, "%Y-%m-%d %H:%M:%S")
-            )
+            "SELECT Season, Episode FROM MARATHON_PROGRESS WHERE ChannelNumber = ? AND ShowName = ?",
+            (channel_number, show_name)
         )
-        conn.commit()
+        return cursor.fetchone()
     conn.close()
 
-def export_music_video_to_db(mv, channel_number):
+def save_marathon_progress(channel_number, show_name, season_number, episode_number):
     with sqlite3.connect(os.getenv("SCHEDULE_DB")) as conn:
         cursor = conn.cursor()
-
         cursor.execute(
-            "INSERT INTO SCHEDULE (ChannelNumber, Name, ShowName, Season, Episode, Overview, Tags, Runtime, Filepath, Start, End) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
-            (
-                channel_number,
-                None,
-                None,
-                None,
-                None,
-                None,
-                "musicvideo",
-                mv.runtime,
-                mv.filepath,
-                datetime.strftime(mv.start, "%Y-%m-%d %H:%M:%S"),
-                datetime.strftime(mv.end, "%Y-%m-%d %H:%M:%S")
-            )
+            "INSERT OR REPLACE INTO MARATHON_PROGRESS (ChannelNumber, ShowName, Season, Episode) VALUES (?, ?, ?, ?)",
+            (channel_number, show_name, season_number, episode_number)
         )
         conn.commit()
     conn.close()
 
-def get_next_half_hour(marker):
-    if marker.minute < 30:
-        marker = marker.replace(minute=30, second=0, microsecond=0)
-    if marker.minute > 30:
-        if marker.hour == 23:
-            marker = marker.replace(hour=0, minute=0, second=0, microsecond=0)
-            marker += timedelta(days=1)
-        else:
-            marker = marker.replace(hour=(marker.hour + 1), minute=0, second=0, microsecond=0)
+def tv_row(content, channel_number):
+    return (
+        channel_number,
+        content.name,
+        content.show_name,
+        content.season_number,
+        content.episode_number,
+        content.overview,
+        content.tags,
+        content.runtime,
+        content.filepath,
+        content.start,
+        content.end
+    )
+
+def movie_row(content, channel_number):
+    return (
+        channel_number,
+        content.name,
+        None,
+        None,
+        None,
+        content.overview,
+        content.tags,
+        content.runtime,
+        content.filepath,
+        content.start,
+        content.end
+    )
+
+def commercial_row(content, channel_number):
+    return (
+        channel_number,
+        None,
+        None,
+        None,
+        None,
+        None,
+        "commercial",
+        content.runtime,
+        content.filepath,
+        content.start,
+        content.end
+    )
+
+def music_video_row(mv, channel_number):
+    return (
+        channel_number,
+        None,
+        None,
+        None,
+        None,
+        None,
+        "musicvideo",
+        mv.runtime,
+        mv.filepath,
+        mv.start,
+        mv.end
+    )
+
+def ppv_movie(catalog, rng):
+    # Movie rows in catalog order so the pick only depends on rng
+    rows = catalog.indices(catalog.mask_type("movie"))
+    return int(rows[rng.randrange(len(rows))]) if len(rows) else None
 
-    return marker
+def get_next_half_hour(marker):
+    return align_up(marker, HALF_HOUR)
 
 def print_content_table(channel):
         table = Table(title="Channel Schedule")
@@ -554,10 +648,10 @@ def print_content_table(channel):
         for block in channel.schedule:
             for slot in block["strategy"]:
                 table.add_row(
-                    datetime.strftime(slot.start, "%Y-%m-%d %H:%M:%S"),
-                    datetime.strftime(slot.end, "%Y-%m-%d %H:%M:%S"),
-                    datetime.strftime(slot.content.start, "%Y-%m-%d %H:%M:%S"),
-                    datetime.strftime(slot.content.end, "%Y-%m-%d %H:%M:%S"),
+                    format_ms(slot.start),
+                    format_ms(slot.end),
+                    format_ms(slot.content.start),
+                    format_ms(slot.content.end),
                     slot.content.filepath
                 )
         
@@ -566,7 +660,7 @@ def print_content_table(channel):
 def get_all_episodes_from_db():
     with sqlite3.connect(os.getenv("CATALOG_DB")) as conn:
         cursor = conn.cursor()
-        query = "SELECT * FROM TV"
+        query = "SELECT * FROM TV ORDER BY ID"
         cursor.execute(query)
         return cursor.fetchall()
     cursor.close()
@@ -574,7 +668,7 @@ def get_all_episodes_from_db():
 def get_all_movies_from_db():
     with sqlite3.connect(os.getenv("CATALOG_DB")) as conn:
         cursor = conn.cursor()
-        query = "SELECT * FROM MOVIES"
+        query = "SELECT * FROM MOVIES ORDER BY ID"
         cursor.execute(query)
         return cursor.fetchall()
     cursor.close()
@@ -582,7 +676,7 @@ def get_all_movies_from_db():
 def get_all_commercials_from_db():
     with sqlite3.connect(os.getenv("CATALOG_DB")) as conn:
         cursor = conn.cursor()
-        query = "SELECT * FROM COMMERCIALS"
+        query = "SELECT * FROM COMMERCIALS ORDER BY ID"
         cursor.execute(query)
         return cursor.fetchall()
     cursor.close()
@@ -590,7 +684,15 @@ def get_all_commercials_from_db():
 def get_all_music_videos_from_db():
     with sqlite3.connect(os.getenv("CATALOG_DB")) as conn:
         cursor = conn.cursor()
-        query = "SELECT * FROM MUSICVIDEOS"
+        query = "SELECT * FROM MUSICVIDEOS ORDER BY ID"
+        cursor.execute(query)
+        return cursor.fetchall()
+    cursor.close()
+
+def get_all_idents_from_db():
+    with sqlite3.connect(os.getenv("CATALOG_DB")) as conn:
+        cursor = conn.cursor()
+        query = "SELECT * FROM IDENTS ORDER BY ID"
         cursor.execute(query)
         return cursor.fetchall()
     cursor.close()
@@ -604,12 +706,65 @@ def get_all_mtv_idents():
     cursor.close()
     
 
-def clear_schedule_table():
+def get_catalog_version():
+    # Cheap fingerprint of the Catalog, changes whenever items are added, removed, retagged or re-probed
+    digest = hashlib.sha1()
+    with sqlite3.connect(os.getenv("CATALOG_DB")) as conn:
+        cursor = conn.cursor()
+        for table in ["TV", "MOVIES", "COMMERCIALS", "MUSICVIDEOS", "IDENTS"]:
+            cursor.execute(f"SELECT COUNT(*), MAX(ID), TOTAL(LENGTH(Tags)), TOTAL(Runtime) FROM {table}")
+            digest.update(repr(cursor.fetchone()).encode("utf-8"))
+    conn.close()
+    return digest.hexdigest()[:16]
+
+def load_catalog(reload=False):
+    # Build the compact Catalog and its indexes once and share them between all channels
+    global catalog, episode_index, tag_index
+    if catalog is not None and not reload:
+        return catalog
+
+    version = get_catalog_version()
+    builder = CatalogBuilder()
+
+    for e in get_all_episodes_from_db():
+        id, name, show_name, season_number, episode_number, overview, tvdb_id, tags, runtime, filepath = e
+        builder.add(name, "tv", overview, tvdb_id, tags, runtime, filepath, show_name, season_number, episode_number, content_id=id)
+
+    for m in get_all_movies_from_db():
+        id, name, overview, tvdb_id, tags, runtime, filepath = m
+        builder.add(name, "movie", overview, tvdb_id, tags, runtime, filepath, content_id=id)
+
+    for c in get_all_commercials_from_db():
+        id, tags, runtime, filepath = c
+        builder.add(filepath, "commercial", None, None, tags, runtime, filepath, content_id=id)
+
+    for m in get_all_music_videos_from_db():
+        id, tags, runtime, filepath = m
+        builder.add(filepath, "musicvideo", None, None, tags, runtime, filepath, content_id=id)
+
+    for i in get_all_idents_from_db():
+        id, tags, runtime, filepath = i
+        builder.add(filepath, "ident", None, None, tags, runtime, filepath, content_id=id)
+
+    catalog = builder.build()
+    catalog.version = version
+    episode_index = EpisodeIndex(catalog)
+    tag_index = TagIndex(catalog)
+    logging.info(f"Loaded {len(catalog)} catalog items (version {version}) into {catalog.nbytes() / 1024 / 1024:.1f} MB")
+    return catalog
+
+def clear_schedule_table(channel_number=None):
     with sqlite3.connect(os.getenv("SCHEDULE_DB")) as conn:
         cursor = conn.cursor()
-        cursor.execute("DELETE FROM SCHEDULE")
+        if channel_number is None:
+            cursor.execute("DELETE FROM SCHEDULE")
+            cursor.execute("DELETE FROM SCHEDULE_META")
+        else:
+            cursor.execute("DELETE FROM SCHEDULE WHERE ChannelNumber = ?", (channel_number,))
+            cursor.execute("DELETE FROM SCHEDULE_META WHERE ChannelNumber = ?", (channel_number,))
         conn.commit()
     cursor.close()
+    notify_schedule("clear", channel_number)
 
 def import_channel_data():
     # Import all channels from JSON
@@ -618,153 +773,218 @@ def import_channel_data():
         all_channel_data = json.load(f)
     
     for channel_item in all_channel_data:
-        # Create Channel object
+        # Create Channel object, the config hash tells when a stored schedule is out of date
+        config_hash = hashlib.sha1(json.dumps(all_channel_data[channel_item], sort_keys=True).encode("utf-8")).hexdigest()[:16]
+        seed = all_channel_data[channel_item].get("channel_seed", int(config_hash, 16))
         channel = Channel(
             all_channel_data[channel_item]["channel_name"], 
             str(all_channel_data[channel_item]["channel_number"]), 
             all_channel_data[channel_item]["channel_description"],
-            all_channel_data[channel_item]["channel_strategies"]        # all_channel_data[channel_item]["templates"]
+            all_channel_data[channel_item]["channel_strategies"],        # all_channel_data[channel_item]["templates"]
+            config_hash,
+            seed
         )
         all_channels.append(channel)
 
     return all_channels
 
 def export_schedule(channel):
+    # Write every row generated since the last export in one transaction
     with sqlite3.connect(os.getenv("SCHEDULE_DB")) as conn:
         cursor = conn.cursor()
+        cursor.executemany(
+            "INSERT INTO SCHEDULE (ChannelNumber, Name, ShowName, Season, Episode, Overview, Tags, Runtime, Filepath, Start, End) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            channel.pending
+        )
+        conn.commit()
+    conn.close()
+    notify_schedule("append", channel.number, channel.pending)
+    channel.pending = []
 
-        for block in channel.schedule:
-            for slot in block["strategy"]:
-                if slot.content:
-                    # Insert content into schedule
-                    if slot.content.type == "tv":
-                        cursor.execute(
-                            "INSERT INTO SCHEDULE (ChannelNumber, Name, ShowName, Season, Episode, Overview, Tags, Runtime, Filepath, Start, End) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
-                            (
-                                channel.number,
-                                slot.content.name,
-                                slot.content.show_name,
-                                slot.content.season_number,
-                                slot.content.episode_number,
-                                slot.content.overview,
-                                slot.content.tags,
-                                slot.content.runtime,
-                                slot.content.filepath,
-                                datetime.strftime(slot.content.start, "%Y-%m-%d %H:%M:%S"),
-                                datetime.strftime(slot.content.end, "%Y-%m-%d %H:%M:%S")
-                            )
-                        )
-                        conn.commit()
-                    elif slot.content.type == "movie":
-                        cursor.execute(
-                            "INSERT INTO SCHEDULE (ChannelNumber, Name, ShowName, Season, Episode, Overview, Tags, Runtime, Filepath, Start, End) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
-                            (
-                                channel.number,
-                                slot.content.name,
-                                None,
-                                None,
-                                None,
-                                slot.content.overview,
-                                slot.content.tags,
-                                slot.content.runtime,
-                                slot.content.filepath,
-                                datetime.strftime(slot.content.start, "%Y-%m-%d %H:%M:%S"),
-                                datetime.strftime(slot.content.end, "%Y-%m-%d %H:%M:%S")
-                            )
-                        )
-                        conn.commit()
-
-                    # Insert commercials
-                    for commercial in slot.commercials:
-                        cursor.execute(
-                            "INSERT INTO SCHEDULE (ChannelNumber, Name, ShowName, Season, Episode, Overview, Tags, Runtime, Filepath, Start, End) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
-                            (
-                                channel.number,
-                                None,
-                                None,
-                                None,
-                                None,
-                                None,
-                                "commercial",
-                                commercial.runtime,
-                                commercial.filepath,
-                                datetime.strftime(commercial.start, "%Y-%m-%d %H:%M:%S"),
-                                datetime.strftime(commercial.end, "%Y-%m-%d %H:%M:%S")
-                            )
-                        )
-                        conn.commit()
+def get_schedule_end(channel_number):
+    with sqlite3.connect(os.getenv("SCHEDULE_DB")) as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT MAX(End) FROM SCHEDULE WHERE ChannelNumber = ?", (channel_number,))
+        end = cursor.fetchone()[0]
+    conn.close()
+    return end
 
-        
-    cursor.close()
+def trim_schedule(before):
+    # Drop rows that finished airing before the given time
+    with sqlite3.connect(os.getenv("SCHEDULE_DB")) as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM SCHEDULE WHERE End < ?", (before,))
+        conn.commit()
+        removed = cursor.rowcount
+    conn.close()
+    if removed:
+        notify_schedule("trim", None, before)
+    return removed
+
+def notify_schedule(event, channel_number, payload=None):
+    for listener in schedule_listeners:
+        try:
+            listener(event, channel_number, payload)
+        except Exception as e:
+            logging.exception(f"Schedule listener failed on {event}: {e}")
+
+def items_between(channel_number, t0, t1):
+    # Rows airing at any point in [t0, t1), in airing order
+    with sqlite3.connect(os.getenv("SCHEDULE_DB")) as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            f"SELECT {SCHEDULE_COLUMNS} FROM SCHEDULE WHERE ChannelNumber = ? AND Start < ? AND End > ? ORDER BY Start",
+            (channel_number, t1, t0)
+        )
+        rows = cursor.fetchall()
+    conn.close()
+    return rows
 
-def create_schedule(channel):
-    # Initialize Schedule DB
-    initialize_schedule_db()
+def item_at(channel_number, t):
+    # Row airing at t, the latest start at or before t via the (ChannelNumber, Start) index
+    with sqlite3.connect(os.getenv("SCHEDULE_DB")) as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            f"SELECT {SCHEDULE_COLUMNS} FROM SCHEDULE WHERE ChannelNumber = ? AND Start <= ? ORDER BY Start DESC LIMIT 1",
+            (channel_number, t)
+        )
+        row = cursor.fetchone()
+    conn.close()
+    return row if row and row[10] > t else None
+
+def row_to_item(row):
+    channel_number, name, show_name, season_number, episode_number, overview, tags, runtime, filepath, start, end = row
+    return {
+        "channel_number": channel_number,
+        "name": name,
+        "show_name": show_name,
+        "season_number": season_number,
+        "episode_number": episode_number,
+        "overview": overview,
+        "tags": tags,
+        "runtime": runtime,
+        "filepath": filepath,
+        "start": start,
+        "end": end
+    }
+
+def fill_gap(channel, pools, selector, start, end, min_program=10 * MINUTE):
+    # Fill start until end without running past end, programs that fit first then commercials
+    marker = start
+    runtimes = pools.catalog.runtime_ms
+
+    while end - marker >= min_program:
+        row = selector.pick_under(end - marker, rng=pools.rng)
+        if row is None:
+            break
+        content = pools.catalog.view(row)
+        content.start = marker
+        content.end = marker + content.runtime_ms
+        if content.type == "tv":
+            channel.pending.append(tv_row(content, channel.number))
+        elif content.type == "musicvideo":
+            channel.pending.append(music_video_row(content, channel.number))
+        else:
+            channel.pending.append(movie_row(content, channel.number))
+        marker = content.end
+
+    while marker < end:
+        row = pools.commercials.draw(lambda r: runtimes[r] <= end - marker)
+        if row is None:
+            break
+        commercial = pools.catalog.view(row)
+        commercial.start = marker
+        commercial.end = marker + commercial.runtime_ms
+        channel.pending.append(commercial_row(commercial, channel.number))
+        marker = commercial.end
 
-    logging.info(f"Creating schedule for {channel.name} - {channel.number}")
-    # Get all Episodes, Commercials and Movies from Catalog
-    all_content = []
+    return marker
 
-    for e in get_all_episodes_from_db():
-        id, name, show_name, season_number, episode_number, overview, tvdb_id, tags, runtime, filepath = e
-        all_content.append(Content(name, "tv", overview, tvdb_id, tags, runtime, filepath, show_name, season_number, episode_number))
+def extend_schedule(channel, start, end):
+    # Generate blocks from start until end and append them to the channel's schedule,
+    # returns where the last block actually finished
+    logging.info(f"Extending schedule for {channel.name} - {channel.number}: {format_ms(start)} to {format_ms(end)}")
 
-    for m in get_all_movies_from_db():
-        id, name, overview, tvdb_id, tags, runtime, filepath = m
-        all_content.append(Content(name, "movie", overview, tvdb_id, tags, runtime, filepath))
+    # Shuffle bags carry over between extends so repeats stay spread out across block boundaries,
+    # they only start over when the catalog is reloaded
+    load_catalog()
+    if channel.pools is None or channel.pools.catalog is not catalog:
+        channel.pools = ContentPools(catalog, min_repeat_distance)
 
-    for c in get_all_commercials_from_db():
-        id, tags, runtime, filepath = c
-        all_content.append(Content(filepath, "commercial", None, None, tags, runtime, filepath))
+    channel_marker = generate_schedule(channel, start, end, pools=channel.pools, full_blocks=True)
+    export_schedule(channel)
+    save_schedule_meta(channel, catalog.version)
+    return channel_marker
 
-    # Get all unique episode and movie tags
-    all_tags = [t.tags for t in all_content]
-    unique_tags = list(set([unique_tag for tag_str in all_tags for unique_tag in tag_str.split(",") if tag_str != "commercial"]))
+def generate_schedule(channel, start, end, rng=None, resume=True, pools=None, full_blocks=False, day_rng=None):
+    # Queue rows for start until end on channel.pending without touching the schedule DB,
+    # everything random comes from rng so a seeded rng gives the same lineup every time.
+    # pools carries shuffle bag state over from earlier windows, fresh bags are used without it.
+    # full_blocks lets the last block run its whole 3-5h past end instead of being cut to fit,
+    # day_rng(day) seeds choices that hold for a whole day, the PPV movie
+    rng = rng or random
 
-    # Set channel marker to track through the day
-    # all_strategies = ["Basic", "MoviesByTag", "TVMarathon"]
-    channel_marker = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-    channel_end = channel_marker + timedelta(hours=24)
+    # Get all Episodes, Commercials and Movies from the shared compact Catalog
+    load_catalog()
+    pools = pools or ContentPools(catalog, min_repeat_distance, rng)
 
-    while channel_marker < channel_end:
-        strategy = random.choice(channel.strategies)
-        block_duration = timedelta(hours=random.randint(3,5))
-        if block_duration > timedelta(hours=(channel_end - channel_marker).total_seconds() / 60 / 60):
-            block_duration = timedelta(hours=(channel_end - channel_marker).total_seconds() / 60 / 60)
-            # Fill In Strategy Method
+    # Runtime-sorted index of everything the Basic strategy can air
+    basic_selector = RuntimeSelector(catalog, catalog.mask_type("tv", "movie"))
 
+    # Set channel marker to track through the window
+    # all_strategies = ["Basic", "MoviesByTag", "TVMarathon"]
+    channel_marker = start
+    channel.schedule = []
+
+    while channel_marker < end:
+        block_start = channel_marker
+        strategy = rng.choice(channel.strategies)
+        channel.last_strategy = strategy
+        block_duration = rng.randint(3,5) * HOUR
+        if not full_blocks:
+            block_duration = min(block_duration, end - channel_marker)
 
         match strategy:
             case "TVMarathon":
-                logging.info(f"Strategy: {strategy} - Block Start: {channel_marker} - Block Size: {block_duration}")
-                strategy, channel_marker = TVMarathonStrategyMethod(all_content).generate_slots(channel_marker, block_duration, channel)
+                logging.info(f"Strategy: {strategy} - Block Start: {format_ms(channel_marker)} - Block Size: {block_duration / HOUR:.2f}h")
+                strategy, channel_marker = TVMarathonStrategyMethod(episode_index, pools, resume=resume).generate_slots(channel_marker, block_duration, channel)
                 block = { "start": channel_marker, "strategy": strategy, "channel_number": channel.number }
             case "MoviesByTag":
-                logging.info(f"Strategy: {strategy} - Block Start: {channel_marker} - Block Size: {block_duration}")
-                strategy, channel_marker = MovieTagStrategyMethod(all_content, unique_tags).generate_slots(channel_marker, block_duration, channel)
+                logging.info(f"Strategy: {strategy} - Block Start: {format_ms(channel_marker)} - Block Size: {block_duration / HOUR:.2f}h")
+                strategy, channel_marker = MovieTagStrategyMethod(tag_index, pools).generate_slots(channel_marker, block_duration, channel)
                 block = { "start": channel_marker, "strategy": strategy, "channel_number": channel.number }
             case "Basic":
-                logging.info(f"Strategy: {strategy} - Block Start: {channel_marker} - Block Size: {block_duration}")
-                strategy, channel_marker = BasicStrategyMethod(all_content).generate_slots(channel_marker, block_duration, channel)
+                logging.info(f"Strategy: {strategy} - Block Start: {format_ms(channel_marker)} - Block Size: {block_duration / HOUR:.2f}h")
+                strategy, channel_marker = BasicStrategyMethod(basic_selector, pools).generate_slots(channel_marker, block_duration, channel)
                 block = { "start": channel_marker, "strategy": strategy, "channel_number": channel.number }
             case "PPV":
-                block_duration = timedelta(days=1)
-                strategy, channel_marker = PPVStrategyMethod(all_content).generate_slots(channel_marker, block_duration, channel)
+                # One movie for the rest of the day
+                block_duration = max(block_duration, day_start(channel_marker) + DAY - channel_marker)
+                strategy, channel_marker = PPVStrategyMethod(pools, day_rng).generate_slots(channel_marker, block_duration, channel)
                 block = { "start": channel_marker, "strategy": strategy, "channel_number": channel.number }
             case "MTV":
-                block_duration = timedelta(days=1)
-                all_music_videos = []
-                for m in get_all_music_videos_from_db():
-                    id, tags, runtime, filepath = m
-                    all_music_videos.append(Content(filepath, "musicvideo", None, None, tags, runtime, filepath))
-                MTVStrategyMethod(all_music_videos).generate_slots(channel_marker, block_duration, channel)
-                channel_marker = channel_end              
+                block_duration = end - channel_marker
+                strategy, channel_marker = MTVStrategyMethod(pools).generate_slots(channel_marker, block_duration, channel)
+                strategy = "MTV"
+
+        # A strategy with nothing to air leaves the marker where it was, stop instead of looping forever
+        if channel_marker <= block_start:
+            logging.warning(f"Channel {channel.number} made no progress at {format_ms(block_start)}, stopping generation")
+            break
 
         if strategy != "MTV":
             channel.schedule.append(block)
-    
-    export_schedule(channel)
+
+    return channel_marker
+
+def create_schedule(channel):
+    # Initialize Schedule DB
+    initialize_schedule_db()
+
+    logging.info(f"Creating schedule for {channel.name} - {channel.number}")
+    channel_marker = day_start(now_ms())
+    extend_schedule(channel, channel_marker, channel_marker + DAY)
 
 # clear_schedule_table()
 # for channel in import_channel_data():
-#     create_schedule(channel)
\ No newline at end of file
+#     create_schedule(channel)
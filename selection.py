@@ -0,0 +1,44 @@
+import random
+import numpy as np
+
+# Classes
+class RuntimeSelector:
+    # Catalog rows sorted by runtime, so everything shorter than a limit is a prefix of self.rows
+    def __init__(self, catalog, mask=None, rng=None, rows=None):
+        self.catalog = catalog
+        self.rng = rng or random
+
+        if rows is None:
+            rows = np.arange(len(catalog)) if mask is None else np.flatnonzero(mask)
+        runtimes = catalog.runtime_ms[rows]
+        order = np.argsort(runtimes, kind="stable")
+        self.rows = rows[order]
+        self.runtimes = runtimes[order]
+
+    def __len__(self):
+        return len(self.rows)
+
+    def count_under(self, limit_ms):
+        return int(np.searchsorted(self.runtimes, limit_ms, side="right"))
+
+    def pick_under(self, limit_ms, exclude=None, attempts=8, rng=None):
+        # Random eligible row, None if nothing fits or everything that fits is excluded.
+        # A few random probes first, the candidate list is only built when they all hit exclude.
+        cutoff = self.count_under(limit_ms)
+        if cutoff == 0:
+            return None
+
+        rng = rng or self.rng
+        for _ in range(attempts):
+            row = int(self.rows[rng.randrange(cutoff)])
+            if not exclude or row not in exclude:
+                return row
+
+        candidates = [int(row) for row in self.rows[:cutoff] if int(row) not in exclude]
+        return rng.choice(candidates) if candidates else None
+
+    def pick(self, exclude=None, rng=None):
+        # Random row regardless of runtime
+        if len(self) == 0:
+            return None
+        return self.pick_under(int(self.runtimes[-1]), exclude, rng=rng)
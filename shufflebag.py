@@ -0,0 +1,66 @@
+import random
+from collections import deque
+
+# Classes
+class ShuffleBag:
+    # Deck of items dealt without replacement and lazily reshuffled once it runs dry.
+    # Items drawn within the last min_repeat_distance draws are skipped when possible.
+    def __init__(self, items, min_repeat_distance=0, rng=None):
+        self.items = list(items)
+        self.rng = rng or random
+        self.position = len(self.items)
+        self.min_repeat_distance = max(0, min(min_repeat_distance, len(self.items) - 1))
+        self.recent = deque()
+        self.recent_counts = {}
+
+    def __len__(self):
+        return len(self.items)
+
+    def reshuffle(self):
+        self.rng.shuffle(self.items)
+        self.position = 0
+
+    def is_recent(self, item):
+        return item in self.recent_counts
+
+    def remember(self, item):
+        if self.min_repeat_distance == 0:
+            return
+        self.recent.append(item)
+        self.recent_counts[item] = self.recent_counts.get(item, 0) + 1
+        if len(self.recent) > self.min_repeat_distance:
+            old = self.recent.popleft()
+            self.recent_counts[old] -= 1
+            if self.recent_counts[old] == 0:
+                del self.recent_counts[old]
+
+    def accepts(self, item, predicate, allow_recent):
+        if not allow_recent and self.is_recent(item):
+            return False
+        return predicate is None or predicate(item)
+
+    def draw(self, predicate=None):
+        if not self.items:
+            return None
+        if self.position >= len(self.items):
+            self.reshuffle()
+
+        for allow_recent in (False, True):
+            # Undealt part of the deck first, the matching item is swapped into the deal position
+            for i in range(self.position, len(self.items)):
+                item = self.items[i]
+                if self.accepts(item, predicate, allow_recent):
+                    self.items[self.position], self.items[i] = item, self.items[self.position]
+                    self.position += 1
+                    self.remember(item)
+                    return item
+
+            # Nothing undealt matches the filter, fall back to items already dealt this pass
+            for i in range(self.position):
+                item = self.items[i]
+                if self.accepts(item, predicate, allow_recent):
+                    self.remember(item)
+                    return item
+
+        return None
+
@@ -0,0 +1,174 @@
+import argparse
+import asyncio
+import logging
+import metrics
+import os
+import random
+import time
+import scheduler_v4
+from dotenv import load_dotenv
+from drift import DriftSync
+from lazy_schedule import LazySchedule
+from player import FakePlayer, SystemClock, VirtualClock, create_player
+from prefetch import Prefetcher
+from runtime import Runtime
+from standby import StandbyManager
+from timeline import SECOND, MINUTE, HOUR, ChannelTimeline, now_ms, align_down
+
+# Plays generated schedules with random channel changes through the real Runtime playout loop and
+# drift job, against a fake player on a virtual clock (a day in seconds) or against mpv without
+# output in real time, and reports how playout held up.
+
+load_dotenv()
+
+# Classes
+class SimulatedRuntime(Runtime):
+    # Runtime on prebuilt timelines, without the schedule DB, disk jobs, keyboard or API
+    def __init__(self, player, clock, channels, timelines):
+        super().__init__(player, int(channels[0].number), clock)
+        self.channels = channels
+        self.timelines = timelines
+
+    def get_schedule(self, channel_number):
+        return self.timelines[int(channel_number)]
+
+    def setup(self):
+        channel_numbers = sorted(self.timelines)
+        self.standby = StandbyManager(self.get_schedule, channel_numbers, mode="off")
+        self.prefetcher = Prefetcher(self.get_schedule, channel_numbers)
+        self.drift_sync = DriftSync(self.player, self.playlist_window, self.get_playout_schedule, lambda: self.state.number, clock=self.clock)
+
+    def start(self):
+        self.loop = asyncio.get_running_loop()
+        self.wake = asyncio.Event()
+        self.setup()
+        self.tasks = [self.start_playout(), self.start_job("drift", self.drift_sync.tick, self.drift_sync.interval)]
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+
+class Simulation:
+    def __init__(self, runtime, rng, mean_zap_minutes):
+        self.runtime = runtime
+        self.player = runtime.player
+        self.clock = runtime.clock
+        self.rng = rng
+        self.mean_zap = mean_zap_minutes * MINUTE
+        self.stats = {"zaps": 0, "idle_ms": 0}
+
+    def next_zap(self):
+        return self.clock.now_ms() + int(self.rng.expovariate(1 / self.mean_zap))
+
+    def zap(self):
+        self.stats["zaps"] += 1
+        self.runtime.change_channel(step=self.rng.choice((-1, 1)))
+
+    async def settle(self):
+        # Let the runtime run until all its tasks are parked on the clock with nothing to wake them
+        while True:
+            await asyncio.sleep(0)
+            for task in self.runtime.tasks:
+                if task.done():
+                    task.result()
+            if self.clock.idle(len(self.runtime.tasks)):
+                return
+
+    async def run_virtual(self, end):
+        # Jump the clock from event to event: zaps, the runtime's own deadlines and files running out
+        self.runtime.start()
+        next_zap = self.next_zap()
+        while True:
+            await self.settle()
+            now = self.clock.now_ms()
+            if now >= end:
+                break
+            events = [next_zap, end]
+            for t in (self.clock.next_deadline(), self.player.ends_at()):
+                if t is not None:
+                    events.append(t)
+            t = max(now, min(events))
+            if self.player.path is None:
+                self.stats["idle_ms"] += t - now
+            self.clock.advance_to(t)
+            self.player.advance()
+            if t == next_zap:
+                self.zap()
+                next_zap = self.next_zap()
+        await self.runtime.stop()
+
+    async def run_realtime(self, seconds):
+        # Real mpv, real clock, zaps still random but at the given mean interval
+        self.runtime.start()
+        end = time.monotonic() + seconds
+        while time.monotonic() < end:
+            await asyncio.sleep(min(max(0.05, self.rng.expovariate(1 / (self.mean_zap / SECOND))), max(0, end - time.monotonic())))
+            self.zap()
+        await self.runtime.stop()
+
+# Functions
+def build_timelines(channels, start, end):
+    # Deterministic schedules, so runs are repeatable and nothing touches the schedule DB
+    timelines = {}
+    schedule_stats = {"items": 0, "gaps": 0, "gap_ms": 0, "overlaps": 0, "overlap_ms": 0}
+    for channel in channels:
+        items = [scheduler_v4.row_to_item(row) for row in LazySchedule(channel).items_between(start, end)]
+        for previous, item in zip(items, items[1:]):
+            if item["start"] > previous["end"]:
+                schedule_stats["gaps"] += 1
+                schedule_stats["gap_ms"] += item["start"] - previous["end"]
+            elif item["start"] < previous["end"]:
+                schedule_stats["overlaps"] += 1
+                schedule_stats["overlap_ms"] += previous["end"] - item["start"]
+        schedule_stats["items"] += len(items)
+        timelines[int(channel.number)] = ChannelTimeline(items)
+    return timelines, schedule_stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless playout simulator")
+    parser.add_argument("--hours", type=float, default=24, help="simulated hours of playout")
+    parser.add_argument("--channels", type=int, default=6, help="channels from CHANNEL_JSON to play")
+    parser.add_argument("--zap-minutes", type=float, default=3, help="mean minutes between channel changes")
+    parser.add_argument("--window", type=int, default=3, help="playlist window size")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--mpv", action="store_true", help="play through mpv with vo=null in real time")
+    parser.add_argument("--seconds", type=float, default=60, help="real seconds to run with --mpv")
+    args = parser.parse_args()
+    os.environ["PLAYLIST_WINDOW"] = str(args.window)
+
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "WARNING"), format="%(message)s")
+    rng = random.Random(args.seed)
+    channels = scheduler_v4.import_channel_data()[:args.channels]
+
+    generation_started = time.perf_counter()
+    start = align_down(now_ms(), HOUR) if args.mpv else align_down(now_ms(), HOUR) - HOUR
+    hours = args.seconds / 3600 + 1 if args.mpv else args.hours + 1
+    timelines, schedule_stats = build_timelines(channels, start, start + int(hours * HOUR))
+    generation_ms = (time.perf_counter() - generation_started) * 1000
+
+    run_started = time.perf_counter()
+    if args.mpv:
+        runtime = SimulatedRuntime(create_player("mpv-null"), SystemClock(), channels, timelines)
+        simulation = Simulation(runtime, rng, args.zap_minutes)
+        asyncio.run(simulation.run_realtime(args.seconds))
+        runtime.player.terminate()
+    else:
+        runtimes = {item["filepath"]: float(item["runtime"]) for timeline in timelines.values() for item in timeline.items}
+        clock = VirtualClock(start + HOUR)
+        runtime = SimulatedRuntime(FakePlayer(clock, runtimes.get), clock, channels, timelines)
+        simulation = Simulation(runtime, rng, args.zap_minutes)
+        asyncio.run(simulation.run_virtual(start + HOUR + int(args.hours * HOUR)))
+    run_seconds = time.perf_counter() - run_started
+
+    stats = metrics.snapshot()
+    print(f"Schedules: {len(timelines)} channels, {schedule_stats['items']} items generated in {generation_ms:.0f} ms")
+    print(f"  gaps {schedule_stats['gaps']} ({schedule_stats['gap_ms'] / SECOND:.1f}s), overlaps {schedule_stats['overlaps']} ({schedule_stats['overlap_ms'] / SECOND:.1f}s)")
+    print(f"Playout: {'mpv vo=null' if args.mpv else f'{args.hours:g} virtual hours'} in {run_seconds:.2f}s wall")
+    print(f"  {dict(simulation.stats, **runtime.stats)}")
+    print(f"  lookup us {stats.get('playout.lookup_us', {'count': 0})}")
+    print(f"  tune-in ms {stats.get('tune_in.' + runtime.tune_in_mode, {'count': 0})}")
+    print(f"  drift {runtime.drift_sync.stats}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+import logging
+import os
+import threading
+import time
+from keyframes import snap_to_keyframe
+from prefetch import MB, warm_range
+from timeline import SECOND, now_ms
+
+# Functions
+def warm_at(path, position, duration, length):
+    # Warm the container header and index plus the bytes around a play position
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        return False
+    estimate = int(size * min(1.0, max(0.0, position / duration))) if duration > 0 else 0
+    warm_range(path, 0, min(size, MB))
+    warm_range(path, max(0, size - MB), MB)
+    return warm_range(path, max(0, estimate - length // 4), length)
+
+# Classes
+class StandbyManager:
+    # Neighbour page-cache warming: the file airing on each channel one flip away has its keyframes
+    # looked up and its header, index and the bytes around the current offset read into the page
+    # cache, so the normal loadfile on a zap does not start cold off the USB drive.
+    # STANDBY_MODE is "off" or "warm".
+    def __init__(self, get_schedule, channel_numbers, mode=None, warm_mb=None):
+        self.get_schedule = get_schedule
+        self.channel_numbers = [int(number) for number in channel_numbers]
+        self.mode = mode or os.getenv("STANDBY_MODE", "off")
+        if self.mode == "mpv":
+            # Paused standby players never reached the screen, only one player owns the display
+            logging.warning("STANDBY_MODE=mpv is no longer supported, using warm")
+            self.mode = "warm"
+        self.warm_bytes = int(float(warm_mb or os.getenv("STANDBY_WARM_MB", 16)) * MB)
+        self.current = None
+        self.previous = None
+        self.warmed = {}
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+
+    def enabled(self):
+        return self.mode == "warm"
+
+    def neighbours(self, channel_number):
+        # Channel down, channel up, then the one we came from
+        i = self.channel_numbers.index(channel_number)
+        channels = [
+            self.channel_numbers[(i - 1) % len(self.channel_numbers)],
+            self.channel_numbers[(i + 1) % len(self.channel_numbers)]
+        ]
+        if self.previous is not None and self.previous != channel_number:
+            channels.append(self.previous)
+        return [number for number in dict.fromkeys(channels) if number != channel_number]
+
+    def tuned(self, channel_number):
+        with self.lock:
+            if channel_number != self.current:
+                self.previous = self.current
+                self.current = channel_number
+
+    def stop(self):
+        self.stopped.set()
+
+    def tick(self):
+        # Nothing to warm until the player has tuned somewhere
+        if self.current is None:
+            return None
+        return self.prepare_all()
+
+    def prepare_all(self):
+        # Returns seconds until the earliest warmed item ends, when everything needs redoing
+        channels = self.neighbours(self.current)
+        deadline = None
+        for channel_number in channels:
+            if self.stopped.is_set():
+                return None
+            item = self.prepare(channel_number)
+            if item and (deadline is None or item["end"] < deadline):
+                deadline = item["end"]
+
+        with self.lock:
+            self.warmed = {number: start for number, start in self.warmed.items() if number in channels}
+        return None if deadline is None else max(0.5, (deadline - now_ms()) / SECOND)
+
+    def prepare(self, channel_number):
+        # Warm the item airing on a channel, returns it or None when nothing is on
+        now = now_ms()
+        item = self.get_schedule(channel_number).item_at(now)
+        if item is None:
+            return None
+
+        # Redo the work only when the channel moved on to another item
+        with self.lock:
+            if self.warmed.get(channel_number) == item["start"]:
+                return item
+
+        start = snap_to_keyframe(item["filepath"], now - item["start"])
+        started = time.monotonic()
+        warm_at(item["filepath"], start, float(item["runtime"]) * SECOND, self.warm_bytes)
+        logging.debug(f"Standby channel {channel_number}: {item['name']} at {start / SECOND:.1f}s in {(time.monotonic() - started) * 1000:.1f} ms")
+        with self.lock:
+            self.warmed[channel_number] = item["start"]
+        return item
@@ -0,0 +1,118 @@
+import time
+from bisect import bisect_right
+from datetime import datetime
+
+# All instants are integer epoch milliseconds and all durations integer milliseconds,
+# datetime objects only show up when reading or writing the outside world
+SECOND = 1000
+MINUTE = 60 * SECOND
+HOUR = 60 * MINUTE
+DAY = 24 * HOUR
+HALF_HOUR = 30 * MINUTE
+
+# Slot sizes a program can be placed in, see slot_size()
+SLOT_SIZES = [30 * MINUTE, 60 * MINUTE, 90 * MINUTE, 120 * MINUTE, 180 * MINUTE, 240 * MINUTE]
+
+DB_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Functions
+def now_ms():
+    return time.time_ns() // 1_000_000
+
+def to_ms(dt):
+    return int(dt.timestamp() * 1000 + 0.5)
+
+def from_ms(ms):
+    return datetime.fromtimestamp(ms // 1000).replace(microsecond=(ms % 1000) * 1000)
+
+def format_ms(ms, fmt=DB_FORMAT):
+    return from_ms(ms).strftime(fmt)
+
+def parse_ms(text, fmt=DB_FORMAT):
+    return to_ms(datetime.strptime(text, fmt))
+
+def runtime_ms(runtime):
+    # Catalog runtimes are seconds as text with two decimals, e.g. "1219.0" or "25.21"
+    return int(round(float(runtime) * 1000))
+
+def local_offset_ms(t):
+    # Offset of local wall-clock time from UTC at instant t, so grids follow the local clock
+    return time.localtime(t // 1000).tm_gmtoff * 1000
+
+def align_down(t, grid=HALF_HOUR):
+    offset = local_offset_ms(t)
+    return (t + offset) // grid * grid - offset
+
+def align_up(t, grid=HALF_HOUR):
+    offset = local_offset_ms(t)
+    return -(-(t + offset) // grid) * grid - offset
+
+def day_start(t):
+    return align_down(t, DAY)
+
+def slot_size(runtime):
+    # Smallest slot a program fits in, anything longer rounds up to whole half hours
+    for size in SLOT_SIZES:
+        if runtime <= size:
+            return size
+    return -(-runtime // HALF_HOUR) * HALF_HOUR
+
+# Classes
+class ChannelTimeline:
+    # One channel's schedule items ordered by start, with parallel start and end arrays for bisect.
+    # The cursor remembers the last item found so lookups moving forward with the clock are O(1).
+    def __init__(self, items=()):
+        self.items = []
+        self.starts = []
+        self.ends = []
+        self.cursor = 0
+        self.extend(items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def extend(self, items):
+        # Items must come in airing order, anything starting before the current end is skipped
+        for item in items:
+            if self.ends and item["start"] < self.ends[-1]:
+                continue
+            self.items.append(item)
+            self.starts.append(item["start"])
+            self.ends.append(item["end"])
+
+    def end(self):
+        return self.ends[-1] if self.ends else None
+
+    def index_at(self, t):
+        # Index of the item airing at t, None if t falls in a gap or outside the timeline
+        cursor = self.cursor
+        for i in (cursor, cursor + 1):
+            if i < len(self.items) and self.starts[i] <= t < self.ends[i]:
+                self.cursor = i
+                return i
+
+        i = bisect_right(self.starts, t) - 1
+        if i < 0 or t >= self.ends[i]:
+            return None
+        self.cursor = i
+        return i
+
+    def item_at(self, t):
+        i = self.index_at(t)
+        return None if i is None else self.items[i]
+
+    def next_index(self, t):
+        # Index of the first item starting after t
+        i = bisect_right(self.starts, t)
+        return i if i < len(self.items) else None
+
+    def next_item(self, t):
+        i = self.next_index(t)
+        return None if i is None else self.items[i]
+
+    def upcoming(self, t):
+        # Item airing at t and everything after it
+        i = self.index_at(t)
+        if i is None:
+            i = self.next_index(t)
+        return [] if i is None else self.items[i:]